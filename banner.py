@@ -0,0 +1,58 @@
+from PIL import ImageDraw
+from print_pipeline import resize_rows, mm_to_dots
+
+MARK_LENGTH = 16  # dots, alignment ticks at both label edges
+MARK_THICKNESS = 2
+
+
+def banner_layout(image, label_width, strip_height, overlap=0, rotate=0):
+    """
+    Output row ranges of each strip for an image resized to label_width,
+    turned 90 degrees counter-clockwise first with rotate=90.
+    Neighbouring strips share `overlap` rows.
+    """
+    width, height = (image.height, image.width) if rotate == 90 else image.size
+    out_height = max(1, int(height * label_width / width))
+    overlap = max(0, min(overlap, strip_height - 1))
+    strips = []
+    top = 0
+    while True:
+        bottom = min(top + strip_height, out_height)
+        strips.append((top, bottom))
+        if bottom >= out_height:
+            return strips
+        top = bottom - overlap
+
+
+def _draw_marks(strip, index, count, overlap):
+    """Ticks on rows that line up with the neighbouring strip, plus its number"""
+    draw = ImageDraw.Draw(strip)
+    rows = []
+    if index > 0:
+        rows.append(0)
+    if index < count - 1:
+        # Same content row as the next strip's first row
+        rows.append(strip.height - max(overlap, MARK_THICKNESS))
+    for row in rows:
+        draw.rectangle((0, row, MARK_LENGTH - 1, row + MARK_THICKNESS - 1), fill=0)
+        draw.rectangle((strip.width - MARK_LENGTH, row, strip.width - 1, row + MARK_THICKNESS - 1), fill=0)
+    draw.text((MARK_LENGTH + 4, 2), f"{index + 1}/{count}", fill=0)
+    return strip
+
+
+def iter_banner_strips(image, label_width, strip_mm=100, overlap_mm=0, marks=False, dpi=300, rotate=0):
+    """
+    Lazily yield grayscale label-width strips of a tall image.
+    Each strip is resized, and with rotate=90 turned, on its own, so only
+    one strip is in memory at a time and the first page can print while
+    the rest is still pending.
+    """
+    strip_height = mm_to_dots(strip_mm, dpi)
+    overlap = mm_to_dots(overlap_mm, dpi)
+    layout = banner_layout(image, label_width, strip_height, overlap, rotate)
+    for index, (top, bottom) in enumerate(layout):
+        strip = resize_rows(image, label_width, top, bottom, rotate)
+        if marks:
+            strip = _draw_marks(strip, index, len(layout), overlap)
+        print(f"Banner strip {index + 1}/{len(layout)}: rows {top}-{bottom}")
+        yield strip
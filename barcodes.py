@@ -0,0 +1,333 @@
+from functools import lru_cache
+import numpy as np
+from PIL import Image
+
+# Code 128 bar/space widths per symbol value, 103-105 are the start codes
+CODE128_PATTERNS = (
+    "212222 222122 222221 121223 121322 131222 122213 122312 132212 221213 "
+    "221312 231212 112232 122132 122231 113222 123122 123221 223211 221132 "
+    "221231 213212 223112 312131 311222 321122 321221 312212 322112 322211 "
+    "212123 212321 232121 111323 131123 131321 112313 132113 132311 211313 "
+    "231113 231311 112133 112331 132131 113123 113321 133121 313121 211331 "
+    "231131 213113 213311 213131 311123 311321 331121 312113 312311 332111 "
+    "314111 221411 431111 111224 111422 121124 121421 141122 141221 112214 "
+    "112412 122114 122411 142112 142211 241211 221114 413111 241112 134111 "
+    "111242 121142 121241 114212 124112 124211 411212 421112 421211 212141 "
+    "214121 412121 111143 111341 131141 114113 114311 411113 411311 113141 "
+    "114131 311141 411131 211412 211214 211232"
+).split()
+CODE128_STOP = "2331112"
+CODE_B, CODE_C = 100, 99  # switch code set
+START_B, START_C = 104, 105
+
+EAN_L = ("0001101", "0011001", "0010011", "0111101", "0100011",
+         "0110001", "0101111", "0111011", "0110111", "0001011")
+EAN_G = tuple("".join("1" if bit == "0" else "0" for bit in code)[::-1] for code in EAN_L)
+EAN_R = tuple("".join("1" if bit == "0" else "0" for bit in code) for code in EAN_L)
+EAN_PARITY = ("LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG",
+              "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL")
+
+
+def _widths_to_modules(widths):
+    """'2122' -> bars and spaces as a module string starting with a bar"""
+    return "".join(("1" if i % 2 == 0 else "0") * int(w) for i, w in enumerate(widths))
+
+
+def code128_values(data):
+    """
+    Symbol values for data, switching to code set C for runs of four or
+    more digits (two digits per symbol) and using set B otherwise.
+    """
+    values, code_set, i = [], None, 0
+    while i < len(data):
+        run = 0
+        while i + run < len(data) and data[i + run].isdigit():
+            run += 1
+        if run >= 4 or (run >= 2 and run == len(data)):
+            if code_set != "C":
+                values.append(CODE_C if values else START_C)
+                code_set = "C"
+            for _ in range(run // 2):
+                values.append(int(data[i:i + 2]))
+                i += 2
+        else:
+            char = data[i]
+            if not 32 <= ord(char) <= 127:
+                raise ValueError(f"Code 128 cannot encode {char!r}")
+            if code_set != "B":
+                values.append(CODE_B if values else START_B)
+                code_set = "B"
+            values.append(ord(char) - 32)
+            i += 1
+    checksum = (values[0] + sum(i * value for i, value in enumerate(values[1:], 1))) % 103
+    return values + [checksum]
+
+
+def code128_modules(data):
+    if not data:
+        raise ValueError("Code 128 needs some data")
+    bars = "".join(_widths_to_modules(CODE128_PATTERNS[value]) for value in code128_values(data))
+    return bars + _widths_to_modules(CODE128_STOP)
+
+
+def ean13_check_digit(digits):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+def ean13_modules(data):
+    """EAN-13 from 12 digits (check digit added) or 13 digits (check digit verified)"""
+    if not data.isdigit() or len(data) not in (12, 13):
+        raise ValueError("EAN-13 needs 12 or 13 digits")
+    check = ean13_check_digit(data)
+    if len(data) == 13 and data[12] != check:
+        raise ValueError(f"EAN-13 check digit should be {check}")
+    digits = data[:12] + check
+    parity = EAN_PARITY[int(digits[0])]
+    left = "".join((EAN_L if p == "L" else EAN_G)[int(d)] for p, d in zip(parity, digits[1:7]))
+    right = "".join(EAN_R[int(d)] for d in digits[7:])
+    return "101" + left + "01010" + right + "101"
+
+
+def ean13_guards():
+    """Module positions of the guard bars, drawn longer than the data bars"""
+    guards = np.zeros(95, dtype=bool)
+    guards[[0, 2, 46, 48, 92, 94]] = True
+    return guards
+
+
+# DataMatrix ECC200, square symbols:
+# size: (data region size, data codewords, error codewords, interleaved blocks)
+DATAMATRIX_SIZES = {
+    10: (8, 3, 5, 1), 12: (10, 5, 7, 1), 14: (12, 8, 10, 1), 16: (14, 12, 12, 1),
+    18: (16, 18, 14, 1), 20: (18, 22, 18, 1), 22: (20, 30, 20, 1), 24: (22, 36, 24, 1),
+    26: (24, 44, 28, 1), 32: (14, 62, 36, 1), 36: (16, 86, 42, 1), 40: (18, 114, 48, 1),
+    44: (20, 144, 56, 1), 48: (22, 174, 68, 1), 52: (24, 204, 84, 2),
+}
+
+
+def _gf_tables():
+    exp, log = [0] * 512, [0] * 256
+    value = 1
+    for i in range(255):
+        exp[i] = value
+        log[value] = i
+        value <<= 1
+        if value & 0x100:
+            value ^= 0x12D  # DataMatrix field polynomial
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+    return exp, log
+
+
+GF_EXP, GF_LOG = _gf_tables()
+
+
+def _gf_mul(a, b):
+    return 0 if a == 0 or b == 0 else GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+@lru_cache(maxsize=None)
+def _rs_generator(count):
+    poly = [1]
+    for i in range(1, count + 1):
+        poly = [a ^ _gf_mul(b, GF_EXP[i]) for a, b in zip(poly + [0], [0] + poly)]
+    return poly
+
+
+def reed_solomon(data, count):
+    """Error correction codewords for data (polynomial division remainder)"""
+    generator = _rs_generator(count)
+    remainder = [0] * count
+    for codeword in data:
+        factor = codeword ^ remainder[0]
+        remainder = remainder[1:] + [0]
+        for i in range(count):
+            remainder[i] ^= _gf_mul(generator[i + 1], factor)
+    return remainder
+
+
+def datamatrix_codewords(data):
+    """ASCII encodation: digit pairs share a codeword, bytes above 127 use Upper Shift"""
+    raw = data.encode("latin-1") if isinstance(data, str) else bytes(data)
+    codewords, i = [], 0
+    while i < len(raw):
+        if i + 1 < len(raw) and chr(raw[i]).isdigit() and chr(raw[i + 1]).isdigit():
+            codewords.append(130 + int(raw[i:i + 2]))
+            i += 2
+        elif raw[i] > 127:
+            codewords += [235, raw[i] - 127]
+            i += 1
+        else:
+            codewords.append(raw[i] + 1)
+            i += 1
+    return codewords
+
+
+def _place(nrow, ncol, codewords):
+    """ECC200 module placement (the "utah" shape walk) into the data area"""
+    grid = [[None] * ncol for _ in range(nrow)]
+
+    def module(row, col, index, bit):
+        if row < 0:
+            row += nrow
+            col += 4 - ((nrow + 4) % 8)
+        if col < 0:
+            col += ncol
+            row += 4 - ((ncol + 4) % 8)
+        grid[row][col] = (codewords[index] >> (8 - bit)) & 1
+
+    def utah(row, col, index):
+        for bit, (dr, dc) in enumerate(((-2, -2), (-2, -1), (-1, -2), (-1, -1), (-1, 0), (0, -2), (0, -1), (0, 0)), 1):
+            module(row + dr, col + dc, index, bit)
+
+    def corner(index, cells):
+        for bit, (row, col) in enumerate(cells, 1):
+            module(row, col, index, bit)
+
+    index, row, col = 0, 4, 0
+    while True:
+        if row == nrow and col == 0:
+            corner(index, ((nrow - 1, 0), (nrow - 1, 1), (nrow - 1, 2), (0, ncol - 2),
+                           (0, ncol - 1), (1, ncol - 1), (2, ncol - 1), (3, ncol - 1)))
+            index += 1
+        if row == nrow - 2 and col == 0 and ncol % 4:
+            corner(index, ((nrow - 3, 0), (nrow - 2, 0), (nrow - 1, 0), (0, ncol - 4),
+                           (0, ncol - 3), (0, ncol - 2), (0, ncol - 1), (1, ncol - 1)))
+            index += 1
+        if row == nrow - 2 and col == 0 and ncol % 8 == 4:
+            corner(index, ((nrow - 3, 0), (nrow - 2, 0), (nrow - 1, 0), (0, ncol - 2),
+                           (0, ncol - 1), (1, ncol - 1), (2, ncol - 1), (3, ncol - 1)))
+            index += 1
+        if row == nrow + 4 and col == 2 and not ncol % 8:
+            corner(index, ((nrow - 1, 0), (nrow - 1, ncol - 1), (0, ncol - 3), (0, ncol - 2),
+                           (0, ncol - 1), (1, ncol - 3), (1, ncol - 2), (1, ncol - 1)))
+            index += 1
+        # Sweep up and to the right
+        while True:
+            if row < nrow and col >= 0 and grid[row][col] is None:
+                utah(row, col, index)
+                index += 1
+            row -= 2
+            col += 2
+            if row < 0 or col >= ncol:
+                break
+        row += 1
+        col += 3
+        # Sweep down and to the left
+        while True:
+            if row >= 0 and col < ncol and grid[row][col] is None:
+                utah(row, col, index)
+                index += 1
+            row += 2
+            col -= 2
+            if row >= nrow or col < 0:
+                break
+        row += 3
+        col += 1
+        if row >= nrow and col >= ncol:
+            break
+
+    if grid[nrow - 1][ncol - 1] is None:
+        # Fixed pattern in the unused lower right corner
+        grid[nrow - 1][ncol - 1] = grid[nrow - 2][ncol - 2] = 1
+        grid[nrow - 1][ncol - 2] = grid[nrow - 2][ncol - 1] = 0
+    return np.array(grid, dtype=bool)
+
+
+def datamatrix_matrix(data):
+    """Boolean module matrix of the smallest square ECC200 symbol for data"""
+    codewords = datamatrix_codewords(data)
+    for size, (region, capacity, ecc_count, blocks) in DATAMATRIX_SIZES.items():
+        if len(codewords) <= capacity:
+            break
+    else:
+        raise ValueError(f"{len(codewords)} codewords is too much for a DataMatrix up to 52x52")
+
+    # Pad, the pads after the first are scrambled by their position
+    if len(codewords) < capacity:
+        codewords.append(129)
+    while len(codewords) < capacity:
+        pad = 129 + (149 * (len(codewords) + 1)) % 253 + 1
+        codewords.append(pad - 254 if pad > 254 else pad)
+
+    # Error correction per interleaved block
+    ecc = [0] * ecc_count
+    for block in range(blocks):
+        block_ecc = reed_solomon(codewords[block::blocks], ecc_count // blocks)
+        ecc[block::blocks] = block_ecc
+
+    regions = size // (region + 2)  # 2x2 data regions from 32x32 up
+    data_size = regions * region
+    area = _place(data_size, data_size, codewords + ecc)
+
+    symbol = np.zeros((size, size), dtype=bool)
+    pitch = region + 2
+    for ry in range(regions):
+        for rx in range(regions):
+            y, x = ry * pitch, rx * pitch
+            symbol[y + 1:y + 1 + region, x + 1:x + 1 + region] = \
+                area[ry * region:(ry + 1) * region, rx * region:(rx + 1) * region]
+            # Finder: solid left and bottom edges, alternating top and right
+            symbol[y:y + pitch, x] = True
+            symbol[y + pitch - 1, x:x + pitch] = True
+            symbol[y, x:x + pitch:2] = True
+            symbol[y + 1:y + pitch:2, x + pitch - 1] = True
+    return symbol
+
+
+def _bars_image(modules, width, height, guards=None, quiet=10):
+    """1D symbol at the largest whole number of dots per module that fits width"""
+    row = np.frombuffer(modules.encode(), dtype=np.uint8) == ord("1")
+    total = len(row) + 2 * quiet
+    pitch = width // total
+    if pitch < 1:
+        raise ValueError(f"Barcode of {total} modules does not fit {width} dots")
+    bars = row.repeat(pitch)
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+    x = (width - len(bars)) // 2
+    if guards is not None:
+        # Data bars stop short, guard bars run the full height
+        extra = max(pitch * 5, height // 10)
+        canvas[:height - extra, x:x + len(bars)][:, bars] = 0
+        canvas[height - extra:, x:x + len(bars)][:, guards.repeat(pitch) & bars] = 0
+    else:
+        canvas[:, x:x + len(bars)][:, bars] = 0
+    return Image.fromarray(canvas)
+
+
+def _matrix_image(matrix, width, max_size, quiet=1):
+    modules = len(matrix) + 2 * quiet
+    pitch = min(width, max_size) // modules
+    if pitch < 1:
+        raise ValueError(f"DataMatrix of {modules} modules does not fit {width} dots")
+    block = matrix.repeat(pitch, axis=0).repeat(pitch, axis=1)
+    size = modules * pitch
+    canvas = np.full((size, width), 255, dtype=np.uint8)
+    x = (width - block.shape[1]) // 2
+    canvas[quiet * pitch:quiet * pitch + block.shape[0], x:x + block.shape[1]][block] = 0
+    return Image.fromarray(canvas)
+
+
+@lru_cache(maxsize=256)
+def _barcode(kind, data, width, height):
+    if kind == "code128":
+        return _bars_image(code128_modules(data), width, height)
+    if kind == "ean13":
+        return _bars_image(ean13_modules(data), width, height, guards=ean13_guards(), quiet=11)
+    if kind == "datamatrix":
+        return _matrix_image(datamatrix_matrix(data), width, max_size=height)
+    raise ValueError(f"Unknown barcode type {kind}")
+
+
+BARCODE_KINDS = {"Code 128": "code128", "EAN-13": "ean13", "DataMatrix": "datamatrix"}
+BARCODE_HEIGHT_MM = 15  # bar height, also the largest DataMatrix
+
+
+def barcode_image(kind, data, width=696, height=180):
+    """
+    Barcode as an L image width dots wide, every module a whole number of
+    dots. For 1D codes height is the bar height, for DataMatrix it caps the
+    symbol size. Cached by (kind, data, width, height).
+    """
+    return _barcode(kind, data, width, height).copy()
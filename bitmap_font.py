@@ -0,0 +1,177 @@
+import os
+import struct
+from abc import ABC, abstractmethod
+import threading
+import numpy as np
+from PIL import Image, ImageDraw
+from font_fit import load_font
+
+CELL = 8  # pixels per font pixel when sampling the outlines
+PIXEL_FONTS = {"5x5-Tami.ttf": 8}  # font pixels per em (1024 units, 128 per pixel)
+
+# Compiled atlas: header, offset table, then every glyph's cells row-major
+# as one np.packbits stream. Offsets are in bits into that stream.
+ATLAS_EXTENSION = ".atlas"
+ATLAS_MAGIC = b"PFA1"
+ATLAS_HEADER = struct.Struct("<4sHHII")  # magic, height, em_cells, glyph count, bits offset
+ATLAS_TABLE = np.dtype([("code", "<u4"), ("width", "<u2"), ("pad", "<u2"), ("offset", "<u4")])
+
+
+def is_pixel_font(path):
+    return os.path.basename(path) in PIXEL_FONTS or path.endswith(ATLAS_EXTENSION)
+
+
+def snap_size(path, size):
+    """Round a pixel font size down to a whole number of dots per font pixel"""
+    if not is_pixel_font(path):
+        return size
+    step = get_bitmap_font(path).em_cells
+    return max(step, size // step * step)
+
+
+class BitmapFont(ABC):
+    """
+    A pixel font as boolean cells per glyph, True is ink. Text is built from
+    those cells and scaled by an integer, so every font pixel becomes an
+    exact block of dots. Subclasses provide _load_glyph.
+    """
+
+    height = 1  # font pixels per line
+    em_cells = 8  # font pixels per em, maps point sizes to a scale
+
+    def __init__(self):
+        self.glyphs = {}
+        self.lock = threading.Lock()
+
+    @abstractmethod
+    def _load_glyph(self, char):
+        """Boolean (height, width) cells of a character not seen before"""
+
+    def glyph(self, char):
+        """Boolean (height, width) cells of one character"""
+        cells = self.glyphs.get(char)
+        if cells is None:
+            cells = self._load_glyph(char)
+            with self.lock:
+                self.glyphs[char] = cells
+        return cells
+
+    def scale_for(self, size):
+        """Dots per font pixel at a FreeType point size"""
+        return max(1, size // self.em_cells)
+
+    def line_cells(self, line):
+        """One line of text as cells, trailing blank columns removed"""
+        if not line:
+            return np.zeros((self.height, 0), dtype=bool)
+        cells = np.hstack([self.glyph(char) for char in line])
+        ink = np.flatnonzero(cells.any(axis=0))
+        return cells[:, :ink[-1] + 1] if len(ink) else cells[:, :0]
+
+    def line_width(self, line, size):
+        return self.line_cells(line).shape[1] * self.scale_for(size)
+
+    def line_height(self, size):
+        return self.height * self.scale_for(size)
+
+
+class TrueTypePixelFont(BitmapFont):
+    """
+    Glyph atlas sampled from a pixel font outline. Each glyph is drawn once
+    with FreeType at CELL pixels per font pixel and sampled at the cell
+    centres, giving one boolean per font pixel.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.em_cells = PIXEL_FONTS[os.path.basename(path)]
+        self.font = load_font(path, CELL * self.em_cells)
+        ascent, descent = self.font.getmetrics()
+        self.height = max(1, round((ascent + descent) / CELL))
+
+    def _load_glyph(self, char):
+        width = max(1, round(self.font.getlength(char) / CELL))
+        image = Image.new("L", (width * CELL, self.height * CELL), 255)
+        ImageDraw.Draw(image).text((0, 0), char, font=self.font, fill=0)
+        return np.asarray(image)[CELL // 2::CELL, CELL // 2::CELL] < 128
+
+
+class AtlasFont(BitmapFont):
+    """
+    A compiled atlas, memory mapped from a file or wrapping atlas bytes.
+    Opening only reads the header and the offset table, glyph bits are
+    unpacked on first use.
+    """
+
+    def __init__(self, source, fallback=None):
+        super().__init__()
+        self.fallback = fallback  # font for characters the atlas lacks
+        if isinstance(source, (bytes, bytearray)):
+            self.data = np.frombuffer(source, dtype=np.uint8)
+        else:
+            self.data = np.memmap(source, dtype=np.uint8, mode="r")
+        magic, self.height, self.em_cells, count, bits_offset = ATLAS_HEADER.unpack_from(self.data)
+        if magic != ATLAS_MAGIC:
+            raise ValueError("Not a glyph atlas")
+        self.table = np.frombuffer(self.data, ATLAS_TABLE, count, ATLAS_HEADER.size)  # sorted by code
+        self.bits = self.data[bits_offset:]
+
+    def _load_glyph(self, char):
+        index = np.searchsorted(self.table["code"], ord(char))
+        if index == len(self.table) or self.table["code"][index] != ord(char):
+            if self.fallback is not None:
+                return self.fallback.glyph(char)
+            return np.zeros((self.height, self.height // 2 + 1), dtype=bool)
+        width, offset = int(self.table["width"][index]), int(self.table["offset"][index])
+        count = self.height * width
+        first, last = offset // 8, (offset + count + 7) // 8
+        bits = np.unpackbits(self.bits[first:last])[offset % 8:offset % 8 + count]
+        return bits.reshape(self.height, width).astype(bool)
+
+
+_fonts = {}
+
+
+def get_bitmap_font(path):
+    """
+    Fonts are loaded once per process and shared across reruns. A compiled
+    atlas next to the TTF (see font_atlas.py) is memory mapped instead of
+    sampling the outlines again.
+    """
+    if path not in _fonts:
+        atlas_path = os.path.splitext(path)[0] + ATLAS_EXTENSION
+        if path.endswith(ATLAS_EXTENSION):
+            _fonts[path] = AtlasFont(path)
+        elif os.path.exists(atlas_path):
+            _fonts[path] = AtlasFont(atlas_path, fallback=TrueTypePixelFont(path))
+        else:
+            _fonts[path] = TrueTypePixelFont(path)
+    return _fonts[path]
+
+
+def render_lines(lines, path, size, width, alignment="center", line_spacing=20, padding=20):
+    """
+    Draw lines of text in a pixel font as an L image width dots wide.
+    Each line is scaled from cells with np.repeat and copied into the
+    canvas, no FreeType or resampling per render.
+    """
+    font = get_bitmap_font(path)
+    scale = font.scale_for(size)
+    line_height = font.line_height(size)
+    height = len(lines) * (line_height + line_spacing) + padding * 2
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+
+    y = padding
+    for line in lines:
+        cells = font.line_cells(line)
+        block = cells.repeat(scale, axis=0).repeat(scale, axis=1)[:, :width]
+        if alignment == "center":
+            x = (width - block.shape[1]) // 2
+        elif alignment == "right":
+            x = width - block.shape[1]
+        else:
+            x = 0
+        canvas[y:y + line_height, x:x + block.shape[1]][block] = 0
+        y += line_height + line_spacing
+    return Image.fromarray(canvas)
@@ -3,10 +3,11 @@
 # https://opengameart.org/sites/default/files/7x4%20font.png
 # https://opengameart.org/content/7x4-font
 
+import hashlib
 import streamlit as st
 import numpy as np
 from PIL import Image
-import pickle
+from font_atlas import atlas_bytes, glyphs_from_sheet
 
 def render_text(text, char_to_image, glyph_width, glyph_height):
     text_length = len(text)
@@ -20,13 +21,13 @@ def render_text(text, char_to_image, glyph_width, glyph_height):
             canvas[:, x_start:x_end] = char_to_image[char]
     return canvas
 
-st.title("Bitmap Font to Dictionary Converter & Tester")
+st.title("Bitmap Font to Atlas Converter & Tester")
 fixed_char_set = "abcdefghij\nklmnopqrst\nuvwxyz .,!\n?:;\"'$£Üẍ©\n0123456789"
-font_image = st.file_uploader("Upload your bitmap font image (.png, .jpg):", type=["png", "jpg"])
+font_file = st.file_uploader("Upload your bitmap font image (.png, .jpg):", type=["png", "jpg"])
 char_set = st.text_area("Enter your character set:", "'''" + fixed_char_set + "'''")
 
-if font_image and char_set:
-    font_image = Image.open(font_image).convert("L")
+if font_file and char_set:
+    font_image = Image.open(font_file).convert("L")
     image_width, image_height = font_image.size
     glyph_width = image_width // 10
     glyph_height = image_height // 5
@@ -56,8 +57,13 @@ if font_image and char_set:
     for char, img in list(char_to_image.items())[:5]:
         st.image(img, caption=f"Glyph: '{char}'", channels="GRAY")
 
-    pickle.dump(char_to_image, open("char_to_image.pkl", "wb"))
-    st.download_button("Download Character to Image Dictionary", "char_to_image.pkl", "char_to_image.pkl")
+    # Compile once per upload, the cells are stored unscaled
+    atlas_key = (hashlib.sha1(font_file.getvalue()).hexdigest(), char_set, glyph_width, glyph_height)
+    if st.session_state.get("atlas_key") != atlas_key:
+        glyphs = glyphs_from_sheet(font_image, char_set, glyph_width - spacer, glyph_height - spacer, 10, 5, spacer)
+        st.session_state.atlas = atlas_bytes(glyphs)
+        st.session_state.atlas_key = atlas_key
+    st.download_button("Download glyph atlas", st.session_state.atlas, "font.atlas")
 
     test_text = st.text_input("Test text rendering:")
 
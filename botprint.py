@@ -1,32 +1,19 @@
 from flask import Flask, request, jsonify
 from PIL import Image
 import tempfile, sys, subprocess
+from classify import choose_dither
 
-def detect_image_type(image):
-    if image.mode == 'L':
-        return 'Grayscale'
-    elif image.mode == 'RGB':
-        # Convert to grayscale for easier analysis
-        grayscale_image = image.convert("L")
-        pixel_values = list(grayscale_image.getdata())
-        unique_values = len(set(pixel_values))
-        
-        if unique_values < 4:
-            return 'Line Art'
-        else:
-            return 'Color'
-    elif image.mode == '1':
-        return 'Black and White'
-    else:
-        return 'Unknown'
-
-def resize_and_dither(image):
+def resize_and_dither(image, dither=True):
     new_width = 696
     aspect_ratio = image.width / image.height
     new_height = int(new_width / aspect_ratio)
     resized_image = image.resize((new_width, new_height), Image.LANCZOS)
     resized_grayscale_image = resized_image.convert("L")
-    dithered_image = resized_grayscale_image.convert("1", dither=Image.FLOYDSTEINBERG)
+    if dither:
+        dithered_image = resized_grayscale_image.convert("1", dither=Image.FLOYDSTEINBERG)
+    else:
+        # Line art keeps crisp edges with a plain threshold
+        dithered_image = resized_grayscale_image.point(lambda p: 255 if p > 127 else 0).convert("1", dither=Image.NONE)
     return resized_grayscale_image, dithered_image
 
 
@@ -48,9 +35,11 @@ def print_image(image):
         image = image.rotate(90, expand=True)
         edited = True
     
-    image_type = detect_image_type(image)
-    if image_type in ['Grayscale', 'Color', 'Line Art']:
-        resized_grayscale_image, dithered_image = resize_and_dither(image)
+    # Same choice as the web app: dither photos, threshold line art
+    if image.mode != '1':
+        image_kind, dither = choose_dither(image)
+        print(f"Detected {image_kind}, dither: {dither}")
+        resized_grayscale_image, dithered_image = resize_and_dither(image, dither=dither)
         image = dithered_image  # Use the dithered image for further processing
         edited = True
     
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+from http_client import session
+from image_fetch import fetch_image
+
+CAT_SEARCH_URL = "https://api.thecatapi.com/v1/images/search"
+BUFFER_SIZE = 3  # ready-to-print cats kept in memory
+MIN_INTERVAL = 5.0  # seconds between API calls, respects the free quota
+ERROR_BACKOFF = 30.0
+
+
+def fetch_cat(api_key, prepare, label_width):
+    """
+    Search a random cat, download it and prepare it for the label width.
+    Returns (grayscale_image, dithered_image), raises on failure.
+    """
+    response = session.get(CAT_SEARCH_URL, headers={"x-api-key": api_key}, timeout=10)
+    response.raise_for_status()
+    image_url = response.json()[0]["url"]
+
+    image, error = fetch_image(image_url)
+    if error:
+        raise Exception(error)
+    return prepare(image.convert("RGB"), label_width)
+
+
+class CatPrefetcher:
+    """Keeps a small ring of downloaded and dithered cats topped up"""
+
+    def __init__(self, api_key, prepare, label_width, size=BUFFER_SIZE, min_interval=MIN_INTERVAL):
+        self.api_key = api_key
+        self.prepare = prepare
+        self.label_width = label_width
+        self.size = size
+        self.min_interval = min_interval
+        self.buffer = deque()
+        self.last_error = None
+        self._last_request = 0.0
+        self._refilling = False  # the refill loop holds an API slot
+        self._waiting = 0  # users blocked in fetch_now
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def pop(self, label_width):
+        """Take a ready cat for this label width, or None if the ring is empty"""
+        with self._cond:
+            if label_width != self.label_width:
+                # Label changed, the buffered cats have the wrong width
+                self.label_width = label_width
+                self.buffer.clear()
+            item = self.buffer.popleft() if self.buffer else None
+            self._cond.notify_all()  # wake the refill loop
+            return item
+
+    def _reserve_request(self):
+        """
+        Claim the next API slot at least min_interval after the previous
+        one and return the seconds to wait for it. Call with _cond held.
+        """
+        now = time.monotonic()
+        self._last_request = max(now, self._last_request + self.min_interval)
+        return self._last_request - now
+
+    def fetch_now(self, label_width):
+        """
+        Cat for a user waiting on an empty ring. A refill already holding
+        an API slot is awaited and its cat taken, otherwise the next slot
+        is claimed ahead of the refill loop.
+        """
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._refilling and not self.buffer:
+                    self._cond.wait()
+                if self.buffer and label_width == self.label_width:
+                    return self.buffer.popleft()
+                wait = self._reserve_request()
+            finally:
+                self._waiting -= 1
+                self._cond.notify_all()
+        if wait > 0:
+            time.sleep(wait)
+        return fetch_cat(self.api_key, self.prepare, label_width)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Users waiting in fetch_now get the next slot first
+                while len(self.buffer) >= self.size or self._waiting:
+                    self._cond.wait()
+                label_width = self.label_width
+                wait = self._reserve_request()
+                self._refilling = True
+
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                item = fetch_cat(self.api_key, self.prepare, label_width)
+            except Exception as e:
+                with self._cond:
+                    self._refilling = False
+                    self._cond.notify_all()
+                self.last_error = str(e)
+                print(f"Error prefetching cat: {e}")
+                time.sleep(ERROR_BACKOFF)
+                continue
+
+            with self._cond:
+                self._refilling = False
+                # Drop it if the label width changed while downloading
+                if label_width == self.label_width and len(self.buffer) < self.size:
+                    self.buffer.append(item)
+                    self.last_error = None
+                self._cond.notify_all()  # wake a waiting fetch_now
+
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+
+def get_prefetcher(api_key, prepare, label_width):
+    """One prefetcher per API key, shared by all sessions"""
+    with _prefetchers_lock:
+        prefetcher = _prefetchers.get(api_key)
+        if prefetcher is None:
+            prefetcher = CatPrefetcher(api_key, prepare, label_width)
+            _prefetchers[api_key] = prefetcher
+        prefetcher.prepare = prepare
+        return prefetcher
@@ -0,0 +1,56 @@
+from PIL import Image, ImageFilter
+
+BILEVEL = "bilevel"
+LINE_ART = "line_art"
+PHOTO = "photo"
+
+SAMPLE_SIZE = 128  # longest side of the analysed copy
+DARK, LIGHT = 48, 208  # grey values counted as ink / paper
+
+
+def _sample(image):
+    scale = SAMPLE_SIZE / max(image.size)
+    if scale < 1:
+        # Nearest keeps the original grey values, a box filter would invent mid tones
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.NEAREST)
+    # Transparency is flattened on the small copy, never at full size
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        image = Image.alpha_composite(Image.new("RGBA", rgba.size, "white"), rgba)
+    return image.convert("L")
+
+
+def image_stats(image):
+    """Tonal and edge statistics of an image as fractions of its pixels"""
+    gray = _sample(image)
+    histogram = gray.histogram()
+    total = sum(histogram) or 1
+    extremes = (sum(histogram[:DARK]) + sum(histogram[LIGHT:])) / total
+    levels = sum(1 for count in histogram if count > total * 0.002)
+    edges = gray.filter(ImageFilter.FIND_EDGES).histogram()
+    edge_fraction = sum(edges[64:]) / total
+    return {"extremes": extremes, "midtones": 1 - extremes, "levels": levels, "edges": edge_fraction}
+
+
+def classify_image(image):
+    """
+    Return BILEVEL, LINE_ART or PHOTO. Works on the histogram of a
+    subsampled copy plus a cheap edge count, so the cost does not depend
+    on the size of the original.
+    """
+    if image.mode == "1":
+        return BILEVEL
+    stats = image_stats(image)
+    if stats["levels"] <= 2 and stats["midtones"] < 0.01:
+        return BILEVEL
+    # Line art only has mid tones on its anti-aliased edges
+    if stats["midtones"] < 0.1 or (stats["midtones"] < 0.3 and stats["edges"] >= stats["midtones"] * 0.5):
+        return LINE_ART
+    return PHOTO
+
+
+def choose_dither(image):
+    """(kind, dither): dither photos, threshold line art and bilevel images"""
+    kind = classify_image(image)
+    return kind, kind == PHOTO
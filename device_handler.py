@@ -4,66 +4,99 @@ from brother_ql.backends.helpers import send
 import usb.core
 import streamlit as st
 
-def process_print_job(image, printer_info, temp_file_path, rotate=0, dither=False, label_type="102", debug=False):
+# Models that can print 300x600 dpi (double resolution along the tape)
+HIGH_RES_MODELS = {
+    "QL-570", "QL-580N", "QL-700", "QL-710W", "QL-720NW",
+    "QL-800", "QL-810W", "QL-820NWB",
+    "QL-1050", "QL-1060N", "QL-1100", "QL-1110NWB",
+}
+
+def supports_600dpi(model):
+    return model in HIGH_RES_MODELS
+
+def _send_page(page, printer_info, rotate, dither, label_type, dpi_600, cut, debug):
+    """Convert one page and send it. Returns (success, error_message)"""
+    qlr = BrotherQLRaster(printer_info["model"])
+    instructions = convert(
+        qlr=qlr,
+        images=[page],
+        label=label_type,
+        rotate=rotate,
+        threshold=70,
+        dither=dither,
+        compress=True,
+        red=False,
+        dpi_600=dpi_600,
+        hq=False,
+        cut=cut,
+    )
+
+    try:
+        # Try to print using Python API
+        success = send(
+            instructions=instructions,
+            printer_identifier=printer_info["identifier"],
+            backend_identifier="pyusb",
+        )
+    except usb.core.USBError as e:
+        if "timeout error" in str(e):
+            if debug:
+                print("USB timeout error occurred, but it's okay.")
+            return True, None
+        raise
+
+    if not success:
+        return False, "Failed to print using Python API"
+    return True, None
+
+def process_print_job(image, printer_info, temp_file_path, rotate=0, dither=False, label_type="102", debug=False, dpi_600=False, pages=None, cut=True):
     """
     Process a single print job.
+    With dpi_600 the image is expected at 600x600 dpi (twice the label
+    width), brother_ql halves it across the head.
+    pages is an optional iterable of images printed as separate pages,
+    each one is converted and sent as soon as it is produced.
     Returns (success, error_message)
     """
     # Get debug flag from secrets if not explicitly passed
     if not debug and 'debug' in st.secrets:
         debug = st.secrets['debug']
 
+    if dpi_600 and not supports_600dpi(printer_info["model"]):
+        return False, f"600 dpi printing is not supported by {printer_info['model']}"
+
+    if pages is None:
+        pages = [temp_file_path]
+
     try:
-        # Prepare the image for printing
-        qlr = BrotherQLRaster(printer_info["model"])
-        
         # Debug print before conversion
         if debug:
             print(f"Starting print job with label_type: {label_type}")
-        
-        instructions = convert(
-            qlr=qlr,
-            images=[temp_file_path],
-            label=label_type,
-            rotate=rotate,
-            threshold=70,
-            dither=dither,
-            compress=True,
-            red=False,
-            dpi_600=False,
-            hq=False,
-            cut=True,
-        )
 
-        # Debug logging
-        if debug:
+            # Debug logging
             print(f"""
             Print parameters:
             - Label type: {label_type}
             - Rotate: {rotate}
             - Dither: {dither}
+            - 600 dpi: {dpi_600}
             - Model: {printer_info['model']}
             - Backend: {printer_info['backend']}
             - Identifier: {printer_info['identifier']}
             """)
 
-        # Try to print using Python API
-        success = send(
-            instructions=instructions,
-            printer_identifier=printer_info["identifier"],
-            backend_identifier="pyusb",
-        )
-        
-        if not success:
-            return False, "Failed to print using Python API"
+        for page_number, page in enumerate(pages, 1):
+            success, error_msg = _send_page(
+                page, printer_info, rotate, dither, label_type, dpi_600, cut, debug
+            )
+            if not success:
+                return False, error_msg if page_number == 1 else f"Page {page_number}: {error_msg}"
+            if debug:
+                print(f"Sent page {page_number}")
 
         return True, None
 
     except usb.core.USBError as e:
-        if "timeout error" in str(e):
-            if debug:
-                print("USB timeout error occurred, but it's okay.")
-            return True, None
         error_msg = f"USBError encountered: {e}"
         if debug:
             print(error_msg)
@@ -73,4 +106,4 @@ def process_print_job(image, printer_info, temp_file_path, rotate=0, dither=Fals
         error_msg = f"Unexpected error during printing: {str(e)}"
         if debug:
             print(error_msg)
-        return False, error_msg 
\ No newline at end of file
+        return False, error_msg
@@ -1,12 +1,17 @@
+import io
 import streamlit as st
 from PIL import Image
+from bitmap_font import AtlasFont
+from font_atlas import atlas_bytes, glyphs_from_sheet, preview
 
 # Streamlit app
 st.title("Glyph Font Display")
 
 # Load default font image
 default_image_path = 'fonts/7x4_font.png'
-font_image = Image.open(default_image_path)
+with open(default_image_path, "rb") as f:
+    sheet_bytes = f.read()
+font_image = Image.open(io.BytesIO(sheet_bytes))
 
 # Create two columns for side-by-side display
 col1, col2 = st.columns(2)
@@ -20,7 +25,8 @@ with col1:
 with col2:
     uploaded_file = st.file_uploader("Upload Font Image", type=["png", "jpg", "jpeg"],label_visibility="collapsed")
     if uploaded_file is not None:
-        font_image = Image.open(uploaded_file)
+        sheet_bytes = uploaded_file.getvalue()
+        font_image = Image.open(io.BytesIO(sheet_bytes))
 
 char_map = st.text_input("Character Map", value="ABCDEFGHIJKLMNOPQRSTUVWXYZ .,!?:;\"'$€+/0123456789")
 # Input settings for width and height of glyphs
@@ -39,40 +45,19 @@ with col3:
 with col4:
     grid_rows = st.number_input("Grid Rows", min_value=1, value=5)
 
-glyph_width_adjusted = glyph_width_corrected + 1  # Adding 1 pixel for spacing on the right
-glyph_height_adjusted = glyph_height_corrected + 1  # Adding 1 pixel for spacing on the bottom
-glyphs_adjusted = []
-for row in range(grid_rows):
-    for col in range(grid_cols):
-        left = col * glyph_width_adjusted
-        upper = row * glyph_height_adjusted
-        right = left + glyph_width_corrected  # Don't include the spacing pixel itself in the glyph
-        lower = upper + glyph_height_corrected  # Don't include the spacing pixel itself in the glyph
-        glyph = font_image.crop((left, upper, right, lower))
-        glyphs_adjusted.append(glyph)
-
-# Create a dictionary mapping characters to their corresponding glyphs
-glyph_dict_adjusted = dict(zip(char_map, glyphs_adjusted))
+# Compiled once per sheet and settings, reruns only look glyphs up
+@st.cache_resource
+def compile_sheet(sheet_bytes, char_map, glyph_width, glyph_height, grid_cols, grid_rows):
+    sheet = Image.open(io.BytesIO(sheet_bytes))
+    glyphs = glyphs_from_sheet(sheet, char_map, glyph_width, glyph_height, grid_cols, grid_rows)
+    return AtlasFont(atlas_bytes(glyphs))
+
+atlas_font = compile_sheet(sheet_bytes, char_map, glyph_width_corrected, glyph_height_corrected, grid_cols, grid_rows)
 
 # Function to display a sequence of glyphs together with one pixel distance between them
 def display_text_together(text):
-    # Calculate the width and height of the final image
-    total_width = len(text) * (glyph_width_corrected + 1) - 1
-    total_height = glyph_height_corrected
-
-    # Create a new blank image
-    final_image = Image.new('L', (total_width, total_height), color=255)
-
-    # Paste each glyph onto the final image
-    x_offset = 0
-    for char in text:
-        if char in glyph_dict_adjusted:
-            glyph = glyph_dict_adjusted[char]
-            final_image.paste(glyph, (x_offset, 0))
-            x_offset += glyph_width_corrected + 1
-
-    # Resize the final image for better visibility
-    final_image_resized = final_image.resize((final_image.width * 5, final_image.height * 5), Image.Resampling.NEAREST)
+    # Upscale 5x without smoothing for better visibility
+    final_image_resized = preview(atlas_font, text, scale=5)
 
     # Display the final image
     st.image(final_image_resized, caption="Sample Text", use_column_width=True)
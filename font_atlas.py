@@ -0,0 +1,124 @@
+"""
+Glyph atlas compiler.
+
+    python font_atlas.py ttf fonts/5x5-Tami.ttf
+    python font_atlas.py sheet fonts/7x4_font.png --glyph 4x7 --grid 10x5 --chars "ABC..."
+    python font_atlas.py show fonts/5x5-Tami.atlas "HELLO"
+"""
+import argparse
+import os
+import string
+import numpy as np
+from PIL import Image
+from bitmap_font import (
+    ATLAS_EXTENSION, ATLAS_HEADER, ATLAS_MAGIC, ATLAS_TABLE,
+    AtlasFont, TrueTypePixelFont,
+)
+
+SHEET_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ .,!?:;\"'$€+/0123456789"  # fonts/7x4_font.png layout
+TTF_CHARS = "".join(char for char in string.printable if char not in "\t\n\r\x0b\x0c")
+
+
+def glyphs_from_sheet(image, chars, glyph_width, glyph_height, cols, rows, spacing=1):
+    """
+    Cut a glyph sheet into boolean cells, glyphs laid out on a grid with
+    `spacing` blank pixels right of and below each one. The blank column is
+    kept as the gap between letters. Ink is whichever of dark or light is
+    the minority, so both polarities work.
+    """
+    sheet = np.asarray(image.convert("L"))
+    ink = sheet < 128
+    if ink.mean() > 0.5:
+        ink = ~ink  # light glyphs on a dark background
+    glyphs = {}
+    for index, char in enumerate(chars[:cols * rows]):
+        row, col = divmod(index, cols)
+        x = col * (glyph_width + spacing)
+        y = row * (glyph_height + spacing)
+        cells = ink[y:y + glyph_height, x:x + glyph_width]
+        glyphs[char] = np.pad(cells, ((0, 0), (0, spacing)))
+    return glyphs
+
+
+def glyphs_from_ttf(path, chars=TTF_CHARS):
+    font = TrueTypePixelFont(path)
+    return {char: font.glyph(char) for char in chars}, font.em_cells
+
+
+def atlas_bytes(glyphs, em_cells=None):
+    """Serialize {char: bool cells} to the atlas format"""
+    heights = {cells.shape[0] for cells in glyphs.values()}
+    if len(heights) != 1:
+        raise ValueError(f"Glyphs must share one height, got {sorted(heights)}")
+    height = heights.pop()
+
+    table = np.zeros(len(glyphs), dtype=ATLAS_TABLE)
+    bits, offset = [], 0
+    for entry, (char, cells) in zip(table, sorted(glyphs.items())):
+        entry["code"], entry["width"], entry["offset"] = ord(char), cells.shape[1], offset
+        bits.append(cells.ravel())
+        offset += cells.size
+
+    bits_offset = ATLAS_HEADER.size + table.nbytes
+    header = ATLAS_HEADER.pack(ATLAS_MAGIC, height, em_cells or height, len(glyphs), bits_offset)
+    packed = np.packbits(np.concatenate(bits)) if bits else np.zeros(0, np.uint8)
+    return header + table.tobytes() + packed.tobytes()
+
+
+def write_atlas(glyphs, path, em_cells=None):
+    data = atlas_bytes(glyphs, em_cells)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def preview(font, text, scale=1):
+    """Text in an AtlasFont as an L image, for the converter tools"""
+    cells = font.line_cells(text)
+    block = cells.repeat(scale, axis=0).repeat(scale, axis=1)
+    return Image.fromarray(np.where(block, 0, 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile bitmap fonts into memory mappable glyph atlases")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ttf = commands.add_parser("ttf", help="sample a pixel TTF (see bitmap_font.PIXEL_FONTS)")
+    ttf.add_argument("font")
+    ttf.add_argument("-o", "--output")
+
+    sheet = commands.add_parser("sheet", help="cut a glyph sheet image")
+    sheet.add_argument("image")
+    sheet.add_argument("--chars", default=SHEET_CHARS)
+    sheet.add_argument("--glyph", default="4x7", help="glyph WIDTHxHEIGHT in pixels")
+    sheet.add_argument("--grid", default="10x5", help="COLSxROWS")
+    sheet.add_argument("--spacing", type=int, default=1)
+    sheet.add_argument("-o", "--output")
+
+    show = commands.add_parser("show", help="print text from an atlas as ASCII art")
+    show.add_argument("atlas")
+    show.add_argument("text")
+
+    args = parser.parse_args()
+    if args.command == "show":
+        font = AtlasFont(args.atlas)
+        for row in font.line_cells(args.text):
+            print("".join("#" if cell else "." for cell in row))
+        return
+
+    if args.command == "ttf":
+        source = args.font
+        glyphs, em_cells = glyphs_from_ttf(source)
+    else:
+        source = args.image
+        glyph_width, glyph_height = (int(v) for v in args.glyph.split("x"))
+        cols, rows = (int(v) for v in args.grid.split("x"))
+        glyphs = glyphs_from_sheet(Image.open(source), args.chars, glyph_width, glyph_height, cols, rows, args.spacing)
+        em_cells = None
+    output = args.output or os.path.splitext(source)[0] + ATLAS_EXTENSION
+    size = write_atlas(glyphs, output, em_cells)
+    print(f"Wrote {len(glyphs)} glyphs to {output} ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from functools import lru_cache
+from PIL import ImageFont
+
+MIN_SIZE = 10
+MAX_SIZE = 199  # same range as the old linear search
+REFERENCE_SIZE = 100  # size used to estimate the linear width per point
+REFERENCE_TEXT = "write something"  # the Label tab's placeholder
+
+
+@lru_cache(maxsize=128)
+def load_font(path, size):
+    """FreeTypeFont objects are immutable, load each (path, size) once"""
+    return ImageFont.truetype(path, size)
+
+
+def text_width(font, lines):
+    """Right edge of the widest line, same as textbbox((0, 0), line)[2]"""
+    return max((font.getbbox(line)[2] for line in lines if line.strip()), default=0)
+
+
+def _fits(path, size, lines, width):
+    return text_width(load_font(path, size), lines) <= width
+
+
+def fit_font_size(text, path, width, min_size=MIN_SIZE, max_size=MAX_SIZE):
+    """
+    Largest font size at which every line of text fits in width dots.
+    Glyph widths grow almost linearly with the size, so one measurement at
+    REFERENCE_SIZE gives a close estimate and a binary search around it
+    only needs a few exact measurements.
+    """
+    lines = [line for line in text.split("\n") if line.strip()]
+    if not lines:
+        return calibrated_size(path, width, min_size, max_size)
+
+    reference = text_width(load_font(path, REFERENCE_SIZE), lines)
+    estimate = int(width * REFERENCE_SIZE / reference) if reference else max_size
+    estimate = max(min_size, min(estimate, max_size))
+
+    # Bracket the answer close to the estimate, fall back to the full range
+    lo, hi = max(min_size, int(estimate * 0.9)), min(max_size, int(estimate * 1.1) + 1)
+    if not _fits(path, lo, lines, width):
+        lo, hi = min_size, lo
+    elif _fits(path, hi, lines, width):
+        lo, hi = hi, max_size
+    if _fits(path, hi, lines, width):
+        return hi
+    if not _fits(path, lo, lines, width):
+        return min_size
+
+    # Invariant: lo fits, hi does not
+    while hi - lo > 1:
+        middle = (lo + hi) // 2
+        if _fits(path, middle, lines, width):
+            lo = middle
+        else:
+            hi = middle
+    return lo
+
+
+@lru_cache(maxsize=64)
+def calibrated_size(path, width, min_size=MIN_SIZE, max_size=MAX_SIZE):
+    """
+    Base size per font and label width: the size at which the placeholder
+    text fills the label. Computed once per process, replaces the old
+    hardcoded 60 (62 mm) and 107 (102 mm) for every font and label type.
+    """
+    return fit_font_size(REFERENCE_TEXT, path, width, min_size, max_size)
@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from PIL import Image
+from mask_pipeline import flatten_transparency
+
+DITHER_WORKERS = 4  # frames dithered at once, also the most frames held in memory
+
+
+def frame_count(image):
+    return getattr(image, "n_frames", 1)
+
+
+def iter_frames(image, step=1, max_frames=None):
+    """
+    Lazily yield every step-th frame of an animated image as an RGB copy.
+    Frames are decoded one at a time by seeking, never all at once.
+    """
+    indexes = range(0, frame_count(image), max(1, step))
+    if max_frames:
+        indexes = indexes[:max_frames]
+    for index in indexes:
+        image.seek(index)
+        yield flatten_transparency(image.convert("RGBA")).convert("RGB")
+
+
+def dither_frame(frame, label_width):
+    """Resize a frame to the label width and dither it to 1-bit"""
+    if frame.width != label_width:
+        height = max(1, int(frame.height * label_width / frame.width))
+        frame = frame.resize((label_width, height), Image.LANCZOS)
+    return frame.convert("L").convert("1", dither=Image.FLOYDSTEINBERG)
+
+
+def iter_dithered_frames(image, label_width, step=1, max_frames=None, workers=DITHER_WORKERS):
+    """
+    Yield dithered frames in order, dithering a small batch in parallel
+    (Pillow releases the GIL while resizing and dithering).
+    """
+    frames = iter_frames(image, step, max_frames)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(islice(frames, workers))
+            if not batch:
+                return
+            yield from pool.map(lambda frame: dither_frame(frame, label_width), batch)
@@ -0,0 +1,225 @@
+import fnmatch
+import hashlib
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from PIL import Image
+from preview import encode_preview, preview_cache, THUMB_WIDTH
+
+GALLERY_FOLDERS = ("temp", "labels")
+INDEX_PATH = os.path.join("temp", "gallery", "index.sqlite3")  # own folder, the journal must not bump temp/ mtime
+IMAGE_PATTERN = "*.[pj][np][g]*"  # png, jpg and jpeg, as the old glob
+HIDDEN_NAME = "write_something"  # placeholder labels never show in the history
+THUMB_FOLDER = "thumbs"  # next to the index
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hidden INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_by_mtime ON images (hidden, mtime_ns DESC);
+CREATE INDEX IF NOT EXISTS images_by_size ON images (size, mtime_ns);
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+# The newest image of each file size, how the history has always told
+# duplicates apart
+_NEWEST_OF_SIZE = """
+    AND NOT EXISTS (
+        SELECT 1 FROM images AS newer
+        WHERE newer.size = images.size AND newer.hidden = 0
+        AND (newer.mtime_ns > images.mtime_ns
+             OR (newer.mtime_ns = images.mtime_ns AND newer.path > images.path))
+    )
+"""
+
+
+@dataclass(frozen=True)
+class GalleryImage:
+    path: str
+    mtime_ns: int
+    size: int
+
+    @property
+    def mtime(self):
+        return self.mtime_ns / 1e9
+
+
+class ThumbnailStore:
+    """
+    Encoded history tiles on disk, one file per image named by a hash of
+    its path. Each thumbnail carries its source's mtime, so one stat tells
+    whether it is current and the original is only decoded when it is not.
+    """
+
+    def __init__(self, directory, width=THUMB_WIDTH):
+        self.directory = directory
+        self.width = width
+
+    def path_for(self, image_path):
+        return os.path.join(self.directory, hashlib.sha1(image_path.encode()).hexdigest()[:20] + ".thumb")
+
+    def get(self, image):
+        """Thumbnail bytes of a GalleryImage, made on first request"""
+        # Same key as preview_file, both share the in-memory cache
+        key = (image.path, image.mtime_ns, image.size, self.width)
+        data = preview_cache.get(key)
+        if data is not None:
+            return data
+
+        thumb_path = self.path_for(image.path)
+        try:
+            if os.stat(thumb_path).st_mtime_ns == image.mtime_ns:
+                with open(thumb_path, "rb") as f:
+                    data = f.read()
+        except FileNotFoundError:
+            pass
+
+        if data is None:
+            with Image.open(image.path) as source:
+                source.draft(None, (self.width, self.width * 4))  # JPEG decodes at reduced scale
+                data = encode_preview(source, self.width)
+            os.makedirs(self.directory, exist_ok=True)
+            partial = f"{thumb_path}.{threading.get_ident()}.part"
+            with open(partial, "wb") as f:
+                f.write(data)
+            os.utime(partial, ns=(image.mtime_ns, image.mtime_ns))
+            os.replace(partial, thumb_path)
+        preview_cache.put(key, data)
+        return data
+
+    def remove(self, image_path):
+        try:
+            os.remove(self.path_for(image_path))
+        except FileNotFoundError:
+            pass
+
+
+def _row(path, stat):
+    folder, name = os.path.split(path)
+    return (path, folder, name, stat.st_size, stat.st_mtime_ns, int(HIDDEN_NAME in name.lower()))
+
+
+class GalleryIndex:
+    """
+    SQLite index of the history folders, so the history tab pages through
+    images with a query instead of listing and stat-ing every file. Saves
+    in the app register themselves with add(); sync() picks up anything
+    else by rescanning only folders whose directory mtime changed.
+    """
+
+    def __init__(self, path=INDEX_PATH, folders=GALLERY_FOLDERS):
+        self.folders = folders
+        self.thumbnails = ThumbnailStore(os.path.join(os.path.dirname(path), THUMB_FOLDER))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def add(self, path):
+        """Index or refresh one saved image, ignored outside the gallery folders"""
+        path = os.path.normpath(path)
+        if os.path.dirname(path) not in self.folders or not fnmatch.fnmatch(os.path.basename(path), IMAGE_PATTERN):
+            return
+        try:
+            row = _row(path, os.stat(path))
+        except OSError:
+            return
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def sync(self, full=False):
+        """
+        Reconcile with the filesystem. A folder is only listed when its
+        mtime moved (files added, removed or renamed), and only new files
+        are stat-ed. full=True re-stats everything, e.g. after files were
+        overwritten outside the app.
+        """
+        for folder in self.folders:
+            try:
+                folder_mtime = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                with self.lock, self.conn:
+                    self.conn.execute("DELETE FROM images WHERE folder = ?", (folder,))
+                    self.conn.execute("DELETE FROM folders WHERE folder = ?", (folder,))
+                continue
+
+            with self.lock:
+                known = self.conn.execute("SELECT mtime_ns FROM folders WHERE folder = ?", (folder,)).fetchone()
+                if known and known[0] == folder_mtime and not full:
+                    continue
+                indexed = {name for (name,) in self.conn.execute("SELECT name FROM images WHERE folder = ?", (folder,))}
+
+            rows, present = [], set()
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not fnmatch.fnmatch(entry.name, IMAGE_PATTERN) or not entry.is_file():
+                        continue
+                    present.add(entry.name)
+                    if full or entry.name not in indexed:
+                        try:
+                            rows.append(_row(os.path.join(folder, entry.name), entry.stat()))
+                        except OSError:
+                            present.discard(entry.name)  # removed while listing
+            removed = [(folder, name) for name in indexed - present]
+
+            with self.lock, self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.conn.executemany("DELETE FROM images WHERE folder = ? AND name = ?", removed)
+                self.conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder, folder_mtime))
+            for _, name in removed:
+                self.thumbnails.remove(os.path.join(folder, name))
+            if rows or removed:
+                print(f"Gallery index: {folder} +{len(rows)} -{len(removed)}")  # Debug print
+
+    def _query(self, columns, search, filter_duplicates, window):
+        """
+        The newest `window` images (all with None), then the search within
+        them, the same order of filters as the old history list.
+        """
+        newest = f"""
+            SELECT path, name, mtime_ns, size FROM images WHERE hidden = 0
+            {_NEWEST_OF_SIZE if filter_duplicates else ""}
+            ORDER BY mtime_ns DESC, path DESC LIMIT ?
+        """
+        sql, params = f"SELECT {columns} FROM ({newest})", [-1 if window is None else window]
+        if search:
+            sql += " WHERE instr(lower(name), ?) > 0"
+            params.append(search.lower())
+        return sql, params
+
+    def count(self, search="", filter_duplicates=True, window=None):
+        sql, params = self._query("count(*)", search, filter_duplicates, window)
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def page(self, offset, limit, search="", filter_duplicates=True, window=None):
+        """GalleryImages newest first"""
+        sql, params = self._query("path, mtime_ns, size", search, filter_duplicates, window)
+        with self.lock:
+            rows = self.conn.execute(
+                sql + " ORDER BY mtime_ns DESC, path DESC LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+        return [GalleryImage(*row) for row in rows]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_gallery():
+    """One index per process, shared across reruns and sessions"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = GalleryIndex()
+        return _index
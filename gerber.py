@@ -0,0 +1,417 @@
+"""
+RS-274X Gerber and Excellon drill rasterizer for PCB etching masks.
+Board artwork is filled with a scanline polygon fill straight at the
+printer's dot pitch, so masks come out dimensionally exact.
+"""
+import math
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+import numpy as np
+from PIL import Image
+
+MM_PER_INCH = 25.4
+ARC_CHORD_MM = 0.05  # max chord length when flattening arcs and circles
+BOARD_MARGIN_MM = 1.0
+
+GERBER_EXTENSIONS = ["gbr", "ger", "gtl", "gbl", "gto", "gbo", "gts", "gbs", "art", "pho", "cmp", "sol"]
+DRILL_EXTENSIONS = ["drl", "xln", "exc", "txt"]
+
+
+@dataclass
+class Shape:
+    polygon: List[Tuple[float, float]]  # closed outline in mm, board coordinates
+    dark: bool = True  # False for clear polarity (LPC)
+
+
+@dataclass
+class Artwork:
+    shapes: List[Shape] = field(default_factory=list)
+    drills: List[Tuple[float, float, float]] = field(default_factory=list)  # x, y, diameter in mm
+    warnings: List[str] = field(default_factory=list)
+
+    def bounds(self):
+        xs, ys = [], []
+        for shape in self.shapes:
+            for x, y in shape.polygon:
+                xs.append(x)
+                ys.append(y)
+        for x, y, diameter in self.drills:
+            xs.extend((x - diameter / 2, x + diameter / 2))
+            ys.extend((y - diameter / 2, y + diameter / 2))
+        if not xs:
+            raise ValueError("No artwork found in file")
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+def _arc_steps(radius, sweep):
+    return max(8, int(math.ceil(abs(sweep) * radius / ARC_CHORD_MM)))
+
+
+def circle_polygon(cx, cy, diameter):
+    radius = diameter / 2
+    steps = _arc_steps(radius, 2 * math.pi)
+    return [(cx + radius * math.cos(2 * math.pi * i / steps),
+             cy + radius * math.sin(2 * math.pi * i / steps)) for i in range(steps)]
+
+
+def capsule_polygon(x0, y0, x1, y1, diameter):
+    """Outline of a round aperture dragged along a straight segment"""
+    if (x0, y0) == (x1, y1):
+        return circle_polygon(x0, y0, diameter)
+    radius = diameter / 2
+    heading = math.atan2(y1 - y0, x1 - x0)
+    steps = max(4, _arc_steps(radius, math.pi) // 2)
+    points = []
+    for cx, cy, start in ((x1, y1, heading - math.pi / 2), (x0, y0, heading + math.pi / 2)):
+        for i in range(steps + 1):
+            angle = start + math.pi * i / steps
+            points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+    return points
+
+
+def _convex_hull(points):
+    points = sorted(set(points))
+    if len(points) <= 2:
+        return points
+
+    def half(sequence):
+        hull = []
+        for p in sequence:
+            while len(hull) >= 2 and ((hull[-1][0] - hull[-2][0]) * (p[1] - hull[-2][1])
+                                      - (hull[-1][1] - hull[-2][1]) * (p[0] - hull[-2][0])) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull
+
+    lower, upper = half(points), half(reversed(points))
+    return lower[:-1] + upper[:-1]
+
+
+def rect_polygon(cx, cy, width, height):
+    w, h = width / 2, height / 2
+    return [(cx - w, cy - h), (cx + w, cy - h), (cx + w, cy + h), (cx - w, cy + h)]
+
+
+def arc_points(x0, y0, x1, y1, cx, cy, clockwise):
+    """Flatten an arc from (x0, y0) to (x1, y1) around (cx, cy), end point included"""
+    radius = math.hypot(x0 - cx, y0 - cy)
+    start = math.atan2(y0 - cy, x0 - cx)
+    end = math.atan2(y1 - cy, x1 - cx)
+    sweep = end - start
+    if clockwise:
+        if sweep >= 0:
+            sweep -= 2 * math.pi
+    elif sweep <= 0:
+        sweep += 2 * math.pi
+    steps = _arc_steps(radius, sweep)
+    points = [(cx + radius * math.cos(start + sweep * i / steps),
+               cy + radius * math.sin(start + sweep * i / steps)) for i in range(1, steps)]
+    points.append((x1, y1))
+    return points
+
+
+class GerberParser:
+    """Parses the RS-274X subset EDA tools emit for copper and mask layers"""
+
+    def __init__(self):
+        self.integer_digits, self.decimal_digits = 2, 6
+        self.omit_trailing = False
+        self.unit = 1.0  # mm per file unit
+        self.apertures = {}
+        self.aperture = None
+        self.x = self.y = 0.0
+        self.interpolation = "G01"
+        self.multi_quadrant = True
+        self.dark = True
+        self.region = None  # list of contours while inside G36/G37
+        self.last_d = "D02"
+        self.artwork = Artwork()
+
+    def parse(self, text):
+        for extended, word in re.findall(r"%([^%]*)%|([^%*]*)\*", text):
+            if extended:
+                for statement in extended.split("*"):
+                    statement = statement.strip()
+                    if statement:
+                        self._extended(statement)
+            else:
+                word = word.strip()
+                if word:
+                    self._word(word)
+        self._close_region()
+        return self.artwork
+
+    def _coordinate(self, value):
+        if "." in value:
+            return float(value) * self.unit
+        sign = -1 if value.startswith("-") else 1
+        digits = value.lstrip("+-")
+        if self.omit_trailing:
+            digits = digits.ljust(self.integer_digits + self.decimal_digits, "0")
+        return sign * int(digits) / 10 ** self.decimal_digits * self.unit
+
+    def _extended(self, statement):
+        if statement.startswith("FS"):
+            match = re.match(r"FS([LTD]?)([AI]?)X(\d)(\d)Y\d\d", statement)
+            if match:
+                self.omit_trailing = match.group(1) == "T"
+                self.integer_digits, self.decimal_digits = int(match.group(3)), int(match.group(4))
+        elif statement.startswith("MO"):
+            self.unit = MM_PER_INCH if statement[2:4] == "IN" else 1.0
+        elif statement.startswith("AD"):
+            match = re.match(r"ADD(\d+)([A-Za-z_.$][\w.$]*),?(.*)", statement)
+            if match:
+                params = [float(p) * self.unit for p in match.group(3).split("X") if p]
+                self.apertures[int(match.group(1))] = (match.group(2), params)
+        elif statement.startswith("LP"):
+            self.dark = statement[2:3] != "C"
+        elif statement.startswith("AM"):
+            self.artwork.warnings.append(f"Aperture macro {statement[2:].split(',')[0]} is not supported")
+
+    def _word(self, word):
+        if word.startswith("G04"):
+            return  # comment
+        for code in re.findall(r"G0*(\d+)", word):
+            code = int(code)
+            if code in (1, 2, 3):
+                self.interpolation = f"G0{code}"
+            elif code == 36:
+                self.region = [[]]
+            elif code == 37:
+                self._close_region()
+            elif code == 74:
+                self.multi_quadrant = False
+            elif code == 75:
+                self.multi_quadrant = True
+
+        d_codes = re.findall(r"D0*(\d+)", word)
+        coordinates = dict(re.findall(r"([XYIJ])([+-]?[\d.]+)", word))
+        for code in d_codes:
+            if int(code) >= 10:
+                self.aperture = int(code)
+                return
+
+        operation = f"D0{d_codes[-1]}" if d_codes else (self.last_d if coordinates else None)
+        if operation is None:
+            return
+        self.last_d = operation
+
+        x = self._coordinate(coordinates["X"]) if "X" in coordinates else self.x
+        y = self._coordinate(coordinates["Y"]) if "Y" in coordinates else self.y
+        i = self._coordinate(coordinates["I"]) if "I" in coordinates else 0.0
+        j = self._coordinate(coordinates["J"]) if "J" in coordinates else 0.0
+
+        if operation == "D01":
+            path = self._path(x, y, i, j)
+            if self.region is not None:
+                if not self.region[-1]:
+                    self.region[-1].append((self.x, self.y))
+                self.region[-1].extend(path)
+            else:
+                self._stroke([(self.x, self.y)] + path)
+        elif operation == "D02":
+            if self.region is not None and self.region[-1]:
+                self.region.append([])
+        elif operation == "D03":
+            self._flash(x, y)
+        self.x, self.y = x, y
+
+    def _path(self, x, y, i, j):
+        if self.interpolation == "G01":
+            return [(x, y)]
+        clockwise = self.interpolation == "G02"
+        if self.multi_quadrant:
+            return arc_points(self.x, self.y, x, y, self.x + i, self.y + j, clockwise)
+        # Single quadrant mode: offsets are unsigned, pick the center that fits
+        candidates = [(self.x + si * abs(i), self.y + sj * abs(j)) for si in (1, -1) for sj in (1, -1)]
+        cx, cy = min(candidates, key=lambda c: abs(math.hypot(self.x - c[0], self.y - c[1])
+                                                   - math.hypot(x - c[0], y - c[1])))
+        return arc_points(self.x, self.y, x, y, cx, cy, clockwise)
+
+    def _add(self, polygon, dark=None):
+        if len(polygon) >= 3:
+            self.artwork.shapes.append(Shape(polygon, self.dark if dark is None else dark))
+
+    def _close_region(self):
+        if self.region is not None:
+            for contour in self.region:
+                self._add(contour)
+        self.region = None
+
+    def _stroke(self, points):
+        shape, params = self.apertures.get(self.aperture, ("C", [0.0]))
+        if shape == "R" and len(params) >= 2:
+            for (x0, y0), (x1, y1) in zip(points, points[1:]):
+                corners = rect_polygon(x0, y0, params[0], params[1]) + rect_polygon(x1, y1, params[0], params[1])
+                self._add(_convex_hull(corners))
+            return
+        # Round apertures, and the nearest round stand-in for anything else
+        diameter = params[0] if params else 0.0
+        if shape == "O" and len(params) >= 2:
+            diameter = min(params[0], params[1])
+        if diameter <= 0:
+            return
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            self._add(capsule_polygon(x0, y0, x1, y1, diameter))
+
+    def _flash(self, x, y):
+        if self.aperture not in self.apertures:
+            return
+        shape, params = self.apertures[self.aperture]
+        hole = None
+        if shape == "C" and params:
+            self._add(circle_polygon(x, y, params[0]))
+            hole = params[1] if len(params) > 1 else None
+        elif shape == "R" and len(params) >= 2:
+            self._add(rect_polygon(x, y, params[0], params[1]))
+            hole = params[2] if len(params) > 2 else None
+        elif shape == "O" and len(params) >= 2:
+            width, height = params[0], params[1]
+            if width >= height:
+                offset = (width - height) / 2
+                self._add(capsule_polygon(x - offset, y, x + offset, y, height))
+            else:
+                offset = (height - width) / 2
+                self._add(capsule_polygon(x, y - offset, x, y + offset, width))
+            hole = params[2] if len(params) > 2 else None
+        elif shape == "P" and len(params) >= 2:
+            # Vertex count and rotation are plain numbers, undo the unit scaling
+            radius = params[0] / 2
+            vertices = int(round(params[1] / self.unit))
+            rotation = math.radians(params[2] / self.unit) if len(params) > 2 else 0.0
+            self._add([(x + radius * math.cos(rotation + 2 * math.pi * k / vertices),
+                        y + radius * math.sin(rotation + 2 * math.pi * k / vertices))
+                       for k in range(vertices)])
+        else:
+            self.artwork.warnings.append(f"Skipped flash of unsupported aperture {shape}")
+        if hole:
+            self._add(circle_polygon(x, y, hole), dark=not self.dark)
+
+
+def parse_gerber(text):
+    """Parse RS-274X text into an Artwork of filled outlines"""
+    return GerberParser().parse(text)
+
+
+def parse_excellon(text, artwork=None):
+    """Add the drill hits of an Excellon file to an Artwork"""
+    artwork = artwork or Artwork()
+    unit, decimals, omit_trailing = 1.0, 3, False
+    tools, tool = {}, None
+    x = y = 0.0
+
+    def coordinate(value):
+        if "." in value:
+            return float(value) * unit
+        sign = -1 if value.startswith("-") else 1
+        digits = value.lstrip("+-")
+        if omit_trailing:
+            digits = digits.ljust(decimals + (2 if unit == MM_PER_INCH else 3), "0")
+        return sign * int(digits) / 10 ** decimals * unit
+
+    for line in text.splitlines():
+        line = line.strip().upper()
+        if not line or line.startswith(";"):
+            continue
+        if line.startswith(("METRIC", "INCH")):
+            unit = MM_PER_INCH if line.startswith("INCH") else 1.0
+            decimals = 4 if unit == MM_PER_INCH else 3
+            # LZ keeps leading zeros, so trailing ones are dropped
+            omit_trailing = ",LZ" in line
+            continue
+        if line in ("M71",):
+            unit, decimals = 1.0, 3
+            continue
+        if line in ("M72",):
+            unit, decimals = MM_PER_INCH, 4
+            continue
+        match = re.match(r"T(\d+)(?:[FS][\d.]+)*C([\d.]+)", line)
+        if match:
+            tools[int(match.group(1))] = float(match.group(2)) * unit
+            continue
+        match = re.match(r"T(\d+)$", line)
+        if match:
+            tool = int(match.group(1))
+            continue
+        if line.startswith(("X", "Y")) and tool in tools:
+            values = dict(re.findall(r"([XY])([+-]?[\d.]+)", line))
+            x = coordinate(values["X"]) if "X" in values else x
+            y = coordinate(values["Y"]) if "Y" in values else y
+            artwork.drills.append((x, y, tools[tool]))
+    return artwork
+
+
+def _fill_polygon(canvas, points, value):
+    """Even-odd scanline fill of one polygon, sampled at pixel centers"""
+    height, width = canvas.shape
+    xs, ys = points[:, 0], points[:, 1]
+    top, bottom = max(int(math.floor(ys.min())), 0), min(int(math.ceil(ys.max())), height)
+    left, right = max(int(math.floor(xs.min())), 0), min(int(math.ceil(xs.max())), width)
+    if top >= bottom or left >= right:
+        return
+
+    x0, y0 = xs, ys
+    x1, y1 = np.roll(xs, -1), np.roll(ys, -1)
+    keep = y0 != y1  # horizontal edges never cross a scanline
+    x0, y0, x1, y1 = x0[keep], y0[keep], x1[keep], y1[keep]
+
+    # Crossing edges for every scanline of the bounding box at once
+    rows = np.arange(top, bottom) + 0.5
+    scan = rows[:, None]
+    crosses = ((y0 <= scan) & (y1 > scan)) | ((y1 <= scan) & (y0 > scan))
+    row_index, edge_index = np.nonzero(crosses)
+    if not len(row_index):
+        return
+    cross_x = x0[edge_index] + (rows[row_index] - y0[edge_index]) * (
+        (x1[edge_index] - x0[edge_index]) / (y1[edge_index] - y0[edge_index]))
+
+    # Toggle parity from the first pixel center right of each crossing
+    columns = np.clip(np.floor(cross_x - 0.5).astype(np.int64) + 1 - left, 0, right - left)
+    toggles = np.zeros((bottom - top, right - left + 1), dtype=np.int32)
+    np.add.at(toggles, (row_index, columns), 1)
+    inside = (np.cumsum(toggles, axis=1)[:, :-1] & 1).astype(bool)
+    canvas[top:bottom, left:right][inside] = value
+
+
+def rasterize(artwork, dpi=300, label_width=None, mirror=False, invert=False, margin_mm=BOARD_MARGIN_MM):
+    """
+    Rasterize artwork at the printer's native dot pitch.
+    Copper is black; invert swaps copper and substrate, mirror flips the
+    board for toner transfer. Both are folded into the fill itself.
+    Returns a 1-bit image label_width dots wide (or board wide if None).
+    """
+    min_x, min_y, max_x, max_y = artwork.bounds()
+    scale = dpi / MM_PER_INCH
+    margin = int(round(margin_mm * scale))
+    board_width = int(math.ceil((max_x - min_x) * scale)) + 2 * margin
+    board_height = int(math.ceil((max_y - min_y) * scale)) + 2 * margin
+
+    width = label_width or board_width
+    if board_width > width:
+        raise ValueError(
+            f"Board is {(max_x - min_x):.1f} mm wide, the label fits {(width - 2 * margin) / scale:.1f} mm"
+        )
+    offset_x = (width - board_width) // 2 + margin
+
+    # ink is True where the printer burns a dot
+    ink = np.zeros((board_height, width), dtype=bool)
+    ink[:, offset_x - margin:offset_x - margin + board_width] = invert
+
+    def to_pixels(polygon):
+        points = np.asarray(polygon, dtype=np.float64)
+        if mirror:
+            px = offset_x + (max_x - points[:, 0]) * scale
+        else:
+            px = offset_x + (points[:, 0] - min_x) * scale
+        py = margin + (max_y - points[:, 1]) * scale
+        return np.column_stack((px, py))
+
+    for shape in artwork.shapes:
+        _fill_polygon(ink, to_pixels(shape.polygon), shape.dark != invert)
+    for x, y, diameter in artwork.drills:
+        # Drill holes are never copper
+        _fill_polygon(ink, to_pixels(circle_polygon(x, y, diameter)), invert)
+
+    print(f"Rasterized board {max_x - min_x:.2f}x{max_y - min_y:.2f} mm to {width}x{board_height} dots at {dpi} dpi")
+    return Image.fromarray(~ink)
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TTL = 300  # seconds a cached response is served without revalidation
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(url, headers=None):
+    """
+    Responses differ by request headers such as Accept or an API key, so
+    those are part of the key. Hashed, the cache holds no credentials.
+    """
+    if not headers:
+        return url
+    normalized = sorted((name.lower(), str(value)) for name, value in headers.items())
+    return f"{url} {hashlib.sha1(json.dumps(normalized).encode()).hexdigest()[:16]}"
+
+
+def _build_session():
+    """One keep-alive session shared by every external API call"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=1)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "printit/1.0"})
+    return session
+
+
+session = _build_session()
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    body: bytes
+    key: Optional[str] = None  # cache_key(url, headers), the url if None
+    content_type: str = ""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    expires_at: float = 0.0
+    stored_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def fresh(self):
+        return time.monotonic() < self.expires_at
+
+    def json(self):
+        return json.loads(self.body)
+
+    def revalidation_headers(self):
+        """Conditional request headers so the server can answer 304"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """In-memory LRU of GET responses, bounded by total body size"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, default_ttl=DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key) -> Optional[CachedResponse]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def store(self, url, body, headers, ttl=None, key=None) -> Optional[CachedResponse]:
+        """Cache a response body unless the server forbids it, key defaults to the url"""
+        key = key or url
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or len(body) > self.max_bytes:
+            return None
+
+        max_age = re.search(r"max-age=(\d+)", cache_control)
+        if ttl is None:
+            ttl = int(max_age.group(1)) if max_age else self.default_ttl
+        if "no-cache" in cache_control:
+            ttl = 0  # keep it, but always revalidate
+
+        entry = CachedResponse(
+            url=url,
+            body=body,
+            key=key,
+            content_type=headers.get("content-type", ""),
+            etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"),
+            expires_at=time.monotonic() + ttl,
+        )
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self.entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+        return entry
+
+    def refresh(self, entry, headers, ttl=None):
+        """A 304 answer: keep the body, extend its lifetime"""
+        return self.store(entry.url, entry.body, {
+            "content-type": entry.content_type,
+            "etag": headers.get("etag", entry.etag),
+            "last-modified": headers.get("last-modified", entry.last_modified),
+            "cache-control": headers.get("cache-control", ""),
+        }, ttl=ttl, key=entry.key)
+
+
+response_cache = ResponseCache()
+
+
+def cached_get(url, headers=None, ttl=None, timeout=10) -> CachedResponse:
+    """
+    GET an idempotent endpoint through the shared session and cache.
+    Fresh entries are served without touching the network, stale ones are
+    revalidated with ETag / Last-Modified.
+    Raises requests.exceptions.RequestException on failure.
+    """
+    key = cache_key(url, headers)
+    entry = response_cache.get(key)
+    if entry is not None and entry.fresh:
+        return entry
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        request_headers.update(entry.revalidation_headers())
+
+    response = session.get(url, headers=request_headers, timeout=timeout)
+    if response.status_code == 304 and entry is not None:
+        return response_cache.refresh(entry, response.headers, ttl) or entry
+
+    response.raise_for_status()
+    stored = response_cache.store(url, response.content, response.headers, ttl, key=key)
+    if stored is None:
+        # Not cacheable, hand it back all the same
+        stored = CachedResponse(url=url, body=response.content,
+                                content_type=response.headers.get("content-type", ""))
+    return stored
@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from PIL import ImageFile
+from http_client import session, response_cache
+
+# Hard limits for remote images, a slow or huge URL must not stall a script
+# thread or blow up memory
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024  # 20 MB on the wire
+MAX_IMAGE_PIXELS = 40_000_000  # ~40 MP decoded, rejects decompression bombs
+DOWNLOAD_DEADLINE = 30  # seconds for the whole body, not per socket read
+CHUNK_SIZE = 64 * 1024
+FETCH_WORKERS = 8
+
+# Downloads run here so the caller can give up at the deadline even while
+# a read is blocked on a silent server
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="image_fetch")
+
+
+def _decode(chunks, max_pixels):
+    """Feed chunks to an incremental parser, checking dimensions early"""
+    parser = ImageFile.Parser()
+    size_checked = False
+    for chunk in chunks:
+        parser.feed(chunk)
+
+        # The header is parsed after the first few chunks
+        if not size_checked and parser.image is not None:
+            width, height = parser.image.size
+            if width * height > max_pixels:
+                raise ValueError(f'Image dimensions {width}x{height} are too large')
+            size_checked = True
+
+    image = parser.close()
+    if image.width * image.height > max_pixels:
+        raise ValueError(f'Image dimensions {image.width}x{image.height} are too large')
+    return image
+
+
+def _body_chunks(response, max_bytes, deadline_at):
+    """
+    Read the body in whatever pieces arrive (read1), so a server trickling
+    a few bytes at a time still hits the size and deadline checks.
+    """
+    read = getattr(response.raw, "read1", response.raw.read)
+    total = 0
+    while True:
+        chunk = read(CHUNK_SIZE, decode_content=True)
+        if not chunk:
+            return
+        total += len(chunk)
+        if total > max_bytes:
+            raise ValueError(f'Image is too large (over {max_bytes // 1024} KB)')
+        if time.monotonic() > deadline_at:
+            raise ValueError('Image download took too long')
+        yield chunk
+
+
+def _fetch(url, timeout, max_bytes, max_pixels, deadline_at):
+    cached = response_cache.get(url)
+    headers = cached.revalidation_headers() if cached is not None else {}
+    total = 0
+    try:
+        if cached is not None and cached.fresh:
+            return _decode([cached.body], max_pixels), None
+
+        # No single socket read may outlast the deadline either
+        read_timeout = max(0.1, min(timeout, deadline_at - time.monotonic()))
+        with session.get(url, headers=headers, timeout=(timeout, read_timeout), stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                response_cache.refresh(cached, response.headers)
+                return _decode([cached.body], max_pixels), None
+            response.raise_for_status()
+
+            # Verify content type is an image
+            content_type = response.headers.get('content-type', '')
+            if not content_type.startswith('image/'):
+                return None, 'URL does not point to a valid image'
+
+            # Trust but verify: reject early if the server announces a huge body
+            content_length = response.headers.get('content-length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                return None, f'Image is too large ({int(content_length) // 1024} KB)'
+
+            received = []
+
+            def kept_chunks():
+                nonlocal total
+                for chunk in _body_chunks(response, max_bytes, deadline_at):
+                    total += len(chunk)
+                    received.append(chunk)
+                    yield chunk
+
+            image = _decode(kept_chunks(), max_pixels)
+            response_cache.store(url, b"".join(received), response.headers)
+    except ReadTimeoutError:
+        # Raw body reads are not wrapped by requests
+        return None, 'Image download took too long'
+    except (requests.exceptions.RequestException, ProtocolError) as e:
+        return None, f'Error fetching image: {str(e)}'
+    except ValueError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f'Error processing image: {str(e)}'
+
+    print(f"Fetched {total} bytes from {url} as {image.size} {image.mode}")  # Debug print
+    return image, None
+
+
+def fetch_image(url, timeout=10, max_bytes=MAX_DOWNLOAD_BYTES,
+                max_pixels=MAX_IMAGE_PIXELS, deadline=DOWNLOAD_DEADLINE):
+    """
+    Stream an image from an HTTPS url and decode it incrementally.
+    The dimensions are checked as soon as the header has been parsed, so
+    oversized images are rejected before their pixel data is downloaded.
+    Repeated URLs are served from the shared response cache. The download
+    runs on a worker, the caller gets an answer within `deadline` seconds
+    whatever the server does.
+    Returns (image, error_message)
+    """
+    if not url.startswith('https://'):
+        return None, 'Only HTTPS URLs are allowed for security'
+
+    future = _fetch_pool.submit(_fetch, url, timeout, max_bytes, max_pixels, time.monotonic() + deadline)
+    try:
+        return future.result(timeout=deadline)
+    except FutureTimeout:
+        # The worker stops at its next read, bounded by the read timeout
+        return None, 'Image download took too long'
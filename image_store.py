@@ -0,0 +1,89 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from gallery import get_gallery
+
+HASH_LENGTH = 12
+_hash_suffix = re.compile(r"_([0-9a-f]{%d})\.png$" % HASH_LENGTH)
+# One writer keeps archival saves off the request path and in order
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image_store")
+
+
+def image_digest(image):
+    digest = hashlib.sha1(f"{image.mode}{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+class ImageStore:
+    """
+    Saves images into a history folder once per distinct content. The
+    content hash is part of the filename, so the index is rebuilt from a
+    directory listing without opening any image.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index = None  # digest -> path
+        self.lock = threading.Lock()
+
+    def _load_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.index = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                match = _hash_suffix.search(entry.name)
+                if match:
+                    self.index[match.group(1)] = entry.path
+
+    def save(self, image, name):
+        """
+        Store image under name (a safe_filename) unless identical content is
+        already stored. Returns (path, created); a duplicate only gets its
+        modification time bumped so it moves to the top of the history.
+        """
+        digest = image_digest(image)
+        with self.lock:
+            if self.index is None:
+                self._load_index()
+            existing = self.index.get(digest)
+            if existing and os.path.exists(existing):
+                now = time.time()
+                os.utime(existing, (now, now))
+                get_gallery().add(existing)
+                return existing, False
+
+            stem = os.path.splitext(name)[0]
+            path = os.path.join(self.directory, f"{stem}_{digest}.png")
+            image.save(path, "PNG")
+            self.index[digest] = path
+            get_gallery().add(path)
+            print(f"Saved {path}")  # Debug print
+            return path, True
+
+    def save_later(self, image, name):
+        """
+        Queue save() on the background writer and return its Future. The
+        image must not be modified afterwards, pass a copy if it will be.
+        """
+        future = _writer.submit(self.save, image, name)
+        future.add_done_callback(_report_error)
+        return future
+
+
+def _report_error(future):
+    if future.exception() is not None:
+        print(f"Error saving image: {future.exception()}")
+
+
+_stores = {}
+
+
+def get_store(directory):
+    """One store per folder, shared across reruns"""
+    if directory not in _stores:
+        _stores[directory] = ImageStore(directory)
+    return _stores[directory]
@@ -6,10 +6,13 @@ from datetime import datetime
 from typing import Optional, Dict, Any
 import uuid
 
+NUP_WINDOW = 3.0  # seconds an N-up batch collects small stickers before it prints
+NUP_MAX_JOBS = 24
+
 @dataclass
 class PrintJob:
     id: str
-    image: Any  # PIL Image
+    image: Any  # PIL Image, None for jobs streaming their "pages" param
     params: Dict[str, Any]
     status: str = "pending"  # pending, processing, completed, failed
     error: Optional[str] = None
@@ -24,6 +27,7 @@ class PrintQueue:
     def __init__(self):
         self.queue = queue.Queue()
         self.jobs = {}  # Store all jobs for status tracking
+        self.nup_pending = {}  # batch key -> (deadline, [jobs]) of parked N-up jobs
         self.lock = threading.Lock()
         self.worker_thread = threading.Thread(target=self._process_queue, daemon=True)
         self.worker_thread.start()
@@ -52,13 +56,15 @@ class PrintQueue:
             image=image,
             params=params
         )
-        self.jobs[job_id] = job
+        with self.lock:
+            self.jobs[job_id] = job
         self.queue.put(job)
         return job_id
 
     def get_job_status(self, job_id: str) -> Optional[PrintJob]:
         """Get the status of a specific job"""
-        return self.jobs.get(job_id)
+        with self.lock:
+            return self.jobs.get(job_id)
 
     def get_queue_status(self):
         """Get overall queue status"""
@@ -82,59 +88,133 @@ class PrintQueue:
             ))
 
             return {
-                "queue_size": self.queue.qsize(),
+                "queue_size": self.queue.qsize() + sum(len(batch) for _, batch in self.nup_pending.values()),
                 "is_processing": self.is_processing,
                 "jobs": {
                     job_id: {
                         "status": job.status,
                         "created_at": job.created_at,
                         "completed_at": job.completed_at,
-                        "error": job.error
+                        "error": job.error,
+                        "tape_saved_mm": job.params.get("tape_saved_mm", 0.0)
                     } for job_id, job in sorted_jobs.items()
                 }
             }
 
+    def _nup_key(self, job):
+        """Only jobs for the same printer, label and settings share a sheet"""
+        params = job.params
+        printer = params.get("printer_info") or {}
+        return (
+            printer.get("backend"), printer.get("identifier"), params.get("label_type"),
+            params.get("label_width"), params.get("rotate", 0), params.get("dither", False),
+            params.get("dpi_600", False),
+        )
+
+    def _hold_nup(self, job):
+        """Park an N-up job, returns its batch once the sheet is full"""
+        key = self._nup_key(job)
+        with self.lock:
+            _, batch = self.nup_pending.setdefault(key, (time.monotonic() + NUP_WINDOW, []))
+            batch.append(job)
+            if len(batch) >= NUP_MAX_JOBS:
+                return self.nup_pending.pop(key)[1]
+        return None
+
+    def _due_nup_batches(self):
+        """Batches whose window expired, removed from the parked ones"""
+        now = time.monotonic()
+        with self.lock:
+            due = [key for key, (deadline, _) in self.nup_pending.items() if deadline <= now]
+            return [self.nup_pending.pop(key)[1] for key in due]
+
+    def _next_nup_deadline(self):
+        """Seconds until the first parked batch is due, None if there is none"""
+        with self.lock:
+            if not self.nup_pending:
+                return None
+            return max(0.0, min(deadline for deadline, _ in self.nup_pending.values()) - time.monotonic())
+
+    def _set_status(self, batch, status, error=None):
+        with self.lock:
+            for queued in batch:
+                queued.status = status
+                if status == "completed":
+                    queued.completed_at = datetime.now()
+                if error is not None:
+                    queued.error = error
+
+    def _print_batch(self, batch):
+        """Print one job, or an N-up batch packed onto one sheet"""
+        job = batch[0]
+        with self.lock:
+            self.is_processing = True
+        self._set_status(batch, "processing")
+
+        try:
+            # Import here to make it mockable in tests
+            from device_handler import process_print_job
+
+            pages = job.params.get("pages")
+            if job.params.get("nup"):
+                from packing import compose_sheet
+                sheet = compose_sheet([queued.image for queued in batch], job.params["label_width"])
+                pages = [sheet]
+                print(f"Packed {len(batch)} stickers into one {sheet.size} sheet")
+
+            # Process the print job using our printer handler
+            success, error = process_print_job(
+                job.image,
+                job.params["printer_info"],
+                job.params.get("temp_file_path"),
+                rotate=job.params.get("rotate", 0),
+                dither=job.params.get("dither", False),
+                label_type=job.params.get("label_type", "102"),
+                dpi_600=job.params.get("dpi_600", False),
+                pages=pages,
+                cut=job.params.get("cut", True)
+            )
+
+            if success:
+                self._set_status(batch, "completed")
+            else:
+                self._set_status(batch, "failed", error)
+
+        except Exception as e:
+            self._set_status(batch, "failed", str(e))
+            print(f"Error processing job {job.id}: {e}")
+
+        finally:
+            with self.lock:
+                self.is_processing = False
+            for _ in batch:
+                self.queue.task_done()
+
     def _process_queue(self):
-        """Worker thread to process print jobs"""
+        """
+        Worker thread to process print jobs. Small stickers are parked per
+        batch key while other jobs keep printing, a batch prints when its
+        N-up window expires or the sheet is full.
+        """
         while True:
             try:
-                job = self.queue.get()
-                if job is None:
-                    continue
-
-                with self.lock:
-                    self.is_processing = True
-                    job.status = "processing"
-
                 try:
-                    # Import here to make it mockable in tests
-                    from device_handler import process_print_job
-                    
-                    # Process the print job using our printer handler
-                    success, error = process_print_job(
-                        job.image,
-                        job.params["printer_info"],
-                        job.params["temp_file_path"],
-                        rotate=job.params.get("rotate", 0),
-                        dither=job.params.get("dither", False),
-                        label_type=job.params.get("label_type", "102")
-                    )
-
-                    if success:
-                        job.status = "completed"
-                        job.completed_at = datetime.now()
+                    job = self.queue.get(timeout=self._next_nup_deadline())
+                except queue.Empty:
+                    job = None
+
+                batches = []
+                if job is not None:
+                    if job.params.get("nup"):
+                        full = self._hold_nup(job)
+                        if full:
+                            batches.append(full)
                     else:
-                        job.status = "failed"
-                        job.error = error
-
-                except Exception as e:
-                    job.status = "failed"
-                    job.error = str(e)
-                    print(f"Error processing job {job.id}: {e}")
+                        batches.append([job])
+                batches += self._due_nup_batches()
 
-                finally:
-                    self.is_processing = False
-                    self.queue.task_done()
+                for batch in batches:
+                    self._print_batch(batch)
 
             except Exception as e:
                 print(f"Error in queue processor: {e}")
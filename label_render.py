@@ -0,0 +1,87 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from font_fit import load_font
+from bitmap_font import is_pixel_font, render_lines
+
+RENDER_CACHE_SIZE = 64  # labels are small, keep the recent edits around
+
+
+def label_font(path, size):
+    """The label font, or Pillow's default if it cannot be loaded"""
+    try:
+        return load_font(path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def text_block_height(text, font, line_spacing=10, padding=20):
+    """Height of the text block based on the bounding boxes of each line"""
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1), color="white"))  # Dummy image for calculation
+    ascent, descent = font.getmetrics()
+    font_height = ascent + descent
+    total_height = 0
+    for line in text.split("\n"):
+        if line.strip():
+            bbox = draw.textbbox((0, 0), line, font=font)
+            total_height += max(bbox[3] - bbox[1], font_height)  # Use the larger of bbox height or font height
+        else:
+            total_height += font_height
+        total_height += line_spacing
+    return total_height + padding * 2
+
+
+def _draw_text(text, font_path, size, alignment, width, line_spacing, padding):
+    font = label_font(font_path, size)
+    img = Image.new("RGB", (width, text_block_height(text, font, line_spacing, padding)), color="white")
+    d = ImageDraw.Draw(img)
+    ascent, descent = font.getmetrics()
+    font_height = ascent + descent
+
+    y = padding
+    for line in text.split("\n"):
+        text_width = 0
+        if line.strip():
+            bbox = d.textbbox((0, y), line, font=font)
+            text_width = bbox[2] - bbox[0]
+            text_height = max(bbox[3] - bbox[1], font_height)
+        else:
+            text_height = font_height
+
+        if alignment == "center":
+            x = (width - text_width) // 2
+        elif alignment == "right":
+            x = width - text_width
+        else:
+            x = 0
+
+        d.text((x, y), line, font=font, fill=(0, 0, 0))
+        y += text_height + line_spacing
+    return img
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render(text, font_path, size, alignment, width, line_spacing, padding, rotate, label_width):
+    if is_pixel_font(font_path):
+        # Pixel exact integer scaling instead of FreeType at an arbitrary size
+        img = render_lines(text.split("\n"), font_path, size, width, alignment, line_spacing, padding).convert("RGB")
+    else:
+        img = _draw_text(text, font_path, size, alignment, width, line_spacing, padding)
+
+    if rotate:
+        img = img.rotate(rotate, expand=True)
+        if label_width and img.width < label_width:
+            # Center the turned block on a full width label
+            label = Image.new("RGB", (label_width, img.height), color="white")
+            label.paste(img, ((label_width - img.width) // 2, 0))
+            img = label
+    return img
+
+
+def render_label(text, font_path, size, alignment="center", width=696,
+                 line_spacing=20, padding=20, rotate=0, label_width=None):
+    """
+    Label image for the given text and settings. Renders are cached by
+    every argument, so reruns with unchanged input skip FreeType entirely.
+    Returns a copy, callers may draw on it.
+    """
+    return _render(text, font_path, size, alignment, width, line_spacing, padding, rotate, label_width).copy()
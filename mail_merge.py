@@ -0,0 +1,96 @@
+import csv
+import io
+from dataclasses import dataclass
+from typing import Optional
+from PIL import Image
+from bitmap_font import snap_size
+from font_fit import fit_font_size
+from label_render import render_label
+from qr_render import qr_image
+
+
+class _Row(dict):
+    def __missing__(self, key):
+        return ""  # unknown {column} placeholders print as nothing
+
+
+def read_csv(data):
+    """(columns, rows) from CSV bytes with a header row, rows are dicts"""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    reader = csv.DictReader(io.StringIO(text))
+    rows = [row for row in reader if any((value or "").strip() for value in row.values())]
+    return reader.fieldnames or [], rows
+
+
+def _stack(top, bottom):
+    sheet = Image.new("RGB", (top.width, top.height + bottom.height), color="white")
+    sheet.paste(top, (0, 0))
+    sheet.paste(bottom, ((top.width - bottom.width) // 2, top.height))
+    return sheet
+
+
+@dataclass
+class MergeProgress:
+    """Shared with the print worker, which pulls pages from the batch generator"""
+    total: int
+    start_row: int = 0
+    sent: int = 0  # pages the printer accepted in this run
+    current: Optional[int] = None  # row being printed
+
+    @property
+    def next_row(self):
+        """First row that has not been printed, where a retry resumes"""
+        return self.start_row + self.sent
+
+
+class MergeLayout:
+    """
+    A label layout compiled once for a whole CSV batch: one font size solved
+    for the longest line of any row and a header rendered once. Rendering a
+    row then only draws its own text.
+    """
+
+    def __init__(self, template, rows, font_path, label_width, alignment="center",
+                 header="", qr_column=None, line_spacing=20, padding=20):
+        self.template = template
+        self.rows = rows
+        self.font_path = font_path
+        self.label_width = label_width
+        self.alignment = alignment
+        self.qr_column = qr_column
+        self.line_spacing = line_spacing
+        self.padding = padding
+
+        all_lines = "\n".join(self.text(row) for row in rows)
+        self.font_size = snap_size(font_path, fit_font_size(all_lines, font_path, label_width))
+        self.header = None
+        if header.strip():
+            header_size = snap_size(font_path, fit_font_size(header, font_path, label_width))
+            self.header = render_label(header, font_path, header_size, alignment, label_width, line_spacing, padding)
+
+    def text(self, row):
+        return self.template.format_map(_Row(row))
+
+    def render(self, row):
+        image = render_label(
+            self.text(row), self.font_path, self.font_size, self.alignment,
+            self.label_width, self.line_spacing, self.padding,
+        )
+        if self.header is not None:
+            image = _stack(self.header, image)
+        if self.qr_column and row.get(self.qr_column):
+            image = _stack(image, qr_image(row[self.qr_column], width=self.label_width).convert("RGB"))
+        return image
+
+    def iter_pages(self, start_row=0, progress=None):
+        """
+        Lazily render rows from start_row on. The worker asks for the next
+        page only after the previous one was sent, so progress.sent counts
+        printed labels and a failed run resumes at progress.next_row.
+        """
+        for index in range(start_row, len(self.rows)):
+            if progress is not None:
+                progress.current = index
+            yield self.render(self.rows[index])
+            if progress is not None:
+                progress.sent += 1
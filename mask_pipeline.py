@@ -0,0 +1,221 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from PIL import Image
+from print_pipeline import resize_rows
+
+CACHE_SIZE = 8  # full-size results kept per process, masks can be large
+BAND_ROWS = 256  # output rows processed at a time by the tiled path
+TILED_MIN_PIXELS = 4_000_000  # larger outputs are built band by band
+TILED_CACHE_SIZE = 1  # tiled masks kept, only the one being adjusted
+
+
+@dataclass(frozen=True)
+class MaskParams:
+    """Everything the Mask Pro adjustment chain depends on"""
+    width_px: int = 0  # 0 keeps the source width
+    pad_to: int = 0  # pad narrower results with white up to this width
+    mirror: bool = False
+    invert: bool = False
+    equalize: bool = False
+    black_point: int = 0
+    white_point: int = 255
+    threshold: int = -1  # -1 keeps grayscale, otherwise output is 1-bit
+    dither: bool = False
+    dpi: int = 300  # 600 doubles width_px and pad_to for high resolution masks
+
+    def geometry(self):
+        return (self.width_px, self.mirror)
+
+
+@lru_cache(maxsize=64)
+def levels_lut(black_point, white_point):
+    """256-entry levels table, built once per (black, white) pair"""
+    lut = []
+    for i in range(256):
+        if i <= black_point:
+            lut.append(0)
+        elif i >= white_point:
+            lut.append(255)
+        else:
+            lut.append(int((i - black_point) / (white_point - black_point) * 255))
+    return tuple(lut)
+
+
+def equalize_lut(histogram):
+    """Same table ImageOps.equalize builds, from a precomputed histogram"""
+    histo = [count for count in histogram if count]
+    if len(histo) <= 1:
+        return list(range(256))
+    step = (sum(histo) - histo[-1]) // 255
+    if not step:
+        return list(range(256))
+    lut = []
+    n = step // 2
+    for i in range(256):
+        lut.append(min(n // step, 255))
+        n += histogram[i]
+    return lut
+
+
+def flatten_transparency(image):
+    """Composite transparent images over white paper"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, "white")
+        return Image.alpha_composite(background, image)
+    return image
+
+
+def output_size(image, params):
+    """Size of the resized mask before padding, the same on both paths"""
+    if params.width_px and params.width_px != image.width:
+        return params.width_px, max(1, int(image.height * params.width_px / image.width))
+    return image.size
+
+
+def compile_lut(params, histogram):
+    """
+    Fold invert, levels, equalization and threshold into one table.
+    The histogram is the one of the geometry-stage grayscale image, the
+    equalization table is derived by pushing it through the earlier steps.
+    """
+    lut = list(range(256))
+    if params.invert:
+        lut = [255 - v for v in lut]
+    if params.equalize:
+        levels = levels_lut(params.black_point, params.white_point)
+        lut = [levels[v] for v in lut]
+
+        # Histogram of the leveled image without building that image
+        leveled_histogram = [0] * 256
+        for value, count in enumerate(histogram):
+            leveled_histogram[lut[value]] += count
+        equalize = equalize_lut(leveled_histogram)
+        lut = [equalize[v] for v in lut]
+    if params.threshold >= 0:
+        lut = [255 if v > params.threshold else 0 for v in lut]
+    return lut
+
+
+class MaskPipeline:
+    """Cached geometry stage plus a single LUT pass per parameter set"""
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._geometry = OrderedDict()
+        self._results = OrderedDict()
+        self._bands = OrderedDict()
+        self._tiled_results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, cache, key, build, size=None):
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        value = build()
+        with self._lock:
+            cache[key] = value
+            while len(cache) > (size or self.cache_size):
+                cache.popitem(last=False)
+        return value
+
+    def _build_geometry(self, image, params):
+        # One grayscale conversion and one resize, mirror is a cheap transpose
+        image = flatten_transparency(image)
+        gray = image if image.mode == "L" else image.convert("L")
+        if gray.size != output_size(gray, params):
+            gray = gray.resize(output_size(gray, params), Image.LANCZOS)
+        if params.mirror:
+            gray = gray.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        return gray, gray.histogram()
+
+    def _build(self, image, source_key, params):
+        gray, histogram = self._cached(
+            self._geometry, (source_key, params.geometry()),
+            lambda: self._build_geometry(image, params),
+        )
+        lut = compile_lut(params, histogram)
+
+        if params.threshold >= 0:
+            adjusted = gray.point(lut, mode="1")
+        else:
+            adjusted = gray.point(lut)
+
+        if params.pad_to and adjusted.width < params.pad_to:
+            # Pad with paper white after the LUT, so inverting never blackens it
+            padded = Image.new(adjusted.mode, (params.pad_to, adjusted.height), 255)
+            padded.paste(adjusted, ((params.pad_to - adjusted.width) // 2, 0))
+            adjusted = padded
+
+        if params.dither and adjusted.mode == "L":
+            return adjusted, adjusted.convert("1", dither=Image.FLOYDSTEINBERG)
+        return adjusted, adjusted
+
+    def _build_bands(self, image, params):
+        """
+        Geometry stage of the tiled path: the resized and mirrored grayscale
+        mask as a list of bands, plus its histogram. The resize
+        intermediates only exist one band at a time.
+        """
+        image = flatten_transparency(image)
+        out_width, out_height = output_size(image, params)
+        bands, histogram = [], [0] * 256
+        for top in range(0, out_height, BAND_ROWS):
+            band = resize_rows(image, out_width, top, min(top + BAND_ROWS, out_height))
+            if params.mirror:
+                band = band.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            for value, count in enumerate(band.histogram()):
+                histogram[value] += count
+            bands.append(band)
+        print(f"Tiled mask {out_width}x{out_height} at {params.dpi} dpi in {len(bands)} bands")
+        return bands, histogram
+
+    def _build_tiled(self, image, source_key, params):
+        """
+        Adjust and threshold the cached bands into the output mask, so a
+        slider move costs one LUT pass and never repeats the resize.
+        Dithering runs once on the assembled mask, error diffusion must not
+        restart at band seams.
+        """
+        bands, histogram = self._cached(
+            self._bands, (source_key, params.geometry()),
+            lambda: self._build_bands(image, params), TILED_CACHE_SIZE,
+        )
+        lut = compile_lut(params, histogram)
+
+        out_width = bands[0].width
+        final_width = max(out_width, params.pad_to)
+        x_offset = (final_width - out_width) // 2
+        binary = params.threshold >= 0
+        adjusted = Image.new("1" if binary else "L", (final_width, sum(band.height for band in bands)), 255)
+
+        top = 0
+        for band in bands:
+            adjusted.paste(band.point(lut, mode="1") if binary else band.point(lut), (x_offset, top))
+            top += band.height
+
+        if params.dither and not binary:
+            return adjusted, adjusted.convert("1", dither=Image.FLOYDSTEINBERG)
+        return adjusted, adjusted
+
+    def render(self, image, source_key, params):
+        """
+        Run the adjustment chain for a source image.
+        source_key identifies the source (e.g. a hash of the upload) so the
+        resize is reused while only the LUT changes.
+        Returns (grayscale_image, display_image)
+        """
+        out_width, out_height = output_size(image, params)
+        if params.dpi > 300 or out_width * out_height > TILED_MIN_PIXELS:
+            # Large masks keep only the latest result, the bands make it cheap to redo
+            return self._cached(
+                self._tiled_results, (source_key, params),
+                lambda: self._build_tiled(image, source_key, params), TILED_CACHE_SIZE,
+            )
+        return self._cached(self._results, (source_key, params), lambda: self._build(image, source_key, params))
+
+
+mask_pipeline = MaskPipeline()
@@ -0,0 +1,64 @@
+from PIL import Image, ImageDraw
+
+GAP = 12  # dots between stickers, the cut marks run down the middle
+DASH = 4
+
+
+def pack_shelves(sizes, width, gap=GAP):
+    """
+    Shelf bin packing, first fit by decreasing height.
+    sizes is a list of (width, height); returns positions in the same order
+    and the total height of the sheet.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i][1], reverse=True)
+    positions = [None] * len(sizes)
+    shelves = []  # [y, height, used_width]
+    sheet_height = 0
+    for i in order:
+        item_width, item_height = sizes[i]
+        if item_width > width:
+            raise ValueError(f"Sticker {item_width} dots wide does not fit a {width} dot label")
+        for shelf in shelves:
+            x = shelf[2] + gap if shelf[2] else 0
+            if x + item_width <= width and item_height <= shelf[1]:
+                positions[i] = (x, shelf[0])
+                shelf[2] = x + item_width
+                break
+        else:
+            y = sheet_height + gap if shelves else 0
+            shelves.append([y, item_height, item_width])
+            positions[i] = (0, y)
+            sheet_height = y + item_height
+    return positions, sheet_height
+
+
+def _dashed_line(draw, start, end):
+    (x0, y0), (x1, y1) = start, end
+    if x0 == x1:
+        for y in range(y0, y1, DASH * 2):
+            draw.line((x0, y, x0, min(y + DASH - 1, y1)), fill=0)
+    else:
+        for x in range(x0, x1, DASH * 2):
+            draw.line((x, y0, min(x + DASH - 1, x1), y0), fill=0)
+
+
+def compose_sheet(images, width, gap=GAP, cut_marks=True):
+    """
+    Pack small stickers side by side into one label-width grayscale raster,
+    with dashed cut lines in the gaps between them.
+    """
+    positions, height = pack_shelves([image.size for image in images], width, gap)
+    sheet = Image.new("L", (width, height), 255)
+    for image, position in zip(images, positions):
+        sheet.paste(image.convert("L"), position)
+
+    if cut_marks:
+        draw = ImageDraw.Draw(sheet)
+        middle = gap // 2
+        for image, (x, y) in zip(images, positions):
+            right, bottom = x + image.width, y + image.height
+            if right + gap <= width:
+                _dashed_line(draw, (right + middle, y), (right + middle, bottom))
+            if bottom + gap <= height:
+                _dashed_line(draw, (x, bottom + middle), (right, bottom + middle))
+    return sheet
@@ -0,0 +1,110 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image, features
+from classify import classify_image, PHOTO
+
+PREVIEW_WIDTH = 800  # wide enough for the main column at 2x
+THUMB_WIDTH = 320  # history grid tiles
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+PHOTO_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+
+
+def content_key(image):
+    """
+    Hash of the pixel data, identical images share a cache entry. Hashes
+    every pixel, pass preview_bytes a key for large images shown on every
+    rerun.
+    """
+    digest = hashlib.sha1(image.tobytes())
+    digest.update(f"{image.mode}{image.size}".encode())
+    return digest.hexdigest()
+
+
+def encode_preview(image, width=PREVIEW_WIDTH):
+    """
+    Shrink an image to display width and encode it once: 1-bit and line art
+    as compact PNG, photos as lossy WebP (JPEG if Pillow lacks WebP).
+    """
+    if image.width > width:
+        height = max(1, int(image.height * width / image.width))
+        if image.mode == "1":
+            # NEAREST aliases dither patterns, average in L and threshold
+            image = image.convert("L").resize((width, height), Image.LANCZOS).point(lambda p: 255 if p >= 128 else 0, mode="1")
+        else:
+            image = image.resize((width, height), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image.mode == "1" or classify_image(image) != PHOTO:
+        if image.mode not in ("1", "L", "LA", "RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image.save(buffer, "PNG", optimize=image.mode == "1")
+    else:
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGBA")
+            white = Image.new("RGBA", image.size, "white")
+            image = Image.alpha_composite(white, image).convert("RGB")
+        image.save(buffer, PHOTO_FORMAT, quality=80)
+    return buffer.getvalue()
+
+
+class PreviewCache:
+    """LRU of encoded preview bytes, bounded by total size"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def image(self, image, width=PREVIEW_WIDTH, key=None):
+        """Encoded preview of an in-memory image"""
+        key = (key or content_key(image), width)
+        data = self.get(key)
+        if data is None:
+            data = encode_preview(image, width)
+            self.put(key, data)
+        return data
+
+    def file(self, path, width=THUMB_WIDTH):
+        """Encoded preview of an image file, only opened on a cache miss"""
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, width)
+        data = self.get(key)
+        if data is None:
+            with Image.open(path) as image:
+                image.draft(None, (width, width * 4))  # JPEG decodes at reduced scale
+                data = encode_preview(image, width)
+            self.put(key, data)
+        return data
+
+
+preview_cache = PreviewCache()
+
+
+def preview_bytes(image, width=PREVIEW_WIDTH, key=None):
+    return preview_cache.image(image, width, key)
+
+
+def preview_file(path, width=THUMB_WIDTH):
+    return preview_cache.file(path, width)
@@ -0,0 +1,74 @@
+import math
+import numpy as np
+from PIL import Image
+
+MM_PER_INCH = 25.4
+
+
+def ink_mask(image, ink_threshold=180):
+    """Boolean array, True where the printer will put a dot"""
+    if image.mode == "1":
+        return ~np.asarray(image)
+    if image.mode != "L":
+        image = image.convert("L")
+    return np.asarray(image) < ink_threshold
+
+
+def trim_whitespace(image, margin=0, axis=0, ink_threshold=180):
+    """
+    Crop blank rows (axis=0) or columns (axis=1) from both ends of an
+    image, keeping margin pixels of white around the ink. Only the tape
+    direction is trimmed, the label width stays as it is.
+    Returns (trimmed_image, pixels_removed)
+    """
+    ink = ink_mask(image, ink_threshold)
+    # One vectorized reduction over the raster, no per-row Python loop
+    lines = np.flatnonzero(ink.any(axis=1 - axis))
+    if not len(lines):
+        return image, 0  # nothing to print, leave it alone
+
+    length = image.height if axis == 0 else image.width
+    start = max(int(lines[0]) - margin, 0)
+    end = min(int(lines[-1]) + 1 + margin, length)
+    removed = length - (end - start)
+    if not removed:
+        return image, 0
+
+    box = (0, start, image.width, end) if axis == 0 else (start, 0, end, image.height)
+    return image.crop(box), removed
+
+
+def dots_to_mm(dots, dpi=300):
+    return dots / dpi * MM_PER_INCH
+
+
+def mm_to_dots(mm, dpi=300):
+    return int(round(mm / MM_PER_INCH * dpi))
+
+
+def resize_rows(image, out_width, top, bottom, rotate=0):
+    """
+    Grayscale rows top..bottom of the image resized to out_width, as if the
+    whole image had been resized with Lanczos. Only the source rows under
+    the filter kernel are cropped and converted. rotate=90 reads the image
+    as if turned 90 degrees counter-clockwise, only the crop is turned.
+    """
+    src_width, src_height = (image.height, image.width) if rotate == 90 else image.size
+    scale = out_width / src_width
+    src_top, src_bottom = top / scale, min(bottom / scale, src_height)
+
+    # Source rows needed around the band for the Lanczos kernel
+    support = int(math.ceil(3 * max(1.0, 1 / scale))) + 1
+    crop_top = max(0, int(src_top) - support)
+    crop_bottom = min(src_height, int(math.ceil(src_bottom)) + support)
+
+    if rotate == 90:
+        # Rows of the turned image are source columns counted from the right
+        band = image.crop((image.width - crop_bottom, 0, image.width - crop_top, image.height))
+        band = band.rotate(90, expand=True)
+    else:
+        band = image.crop((0, crop_top, image.width, crop_bottom))
+    return band.convert("L").resize(
+        (out_width, bottom - top), Image.LANCZOS,
+        box=(0, src_top - crop_top, src_width, src_bottom - crop_top),
+    )
@@ -1,15 +1,13 @@
 import streamlit as st
-from PIL import Image, ImageDraw, ImageFont, PngImagePlugin, ImageOps
-import requests
+from PIL import Image, ImageFont, PngImagePlugin, ImageOps
 import io
-import glob
 import base64
+import hashlib
 import os
 import re
 import tempfile
 from datetime import datetime
 import time
-import qrcode
 from brother_ql.models import ModelsManager
 from brother_ql.backends import backend_factory
 from brother_ql.raster import BrotherQLRaster
@@ -19,6 +17,28 @@ from brother_ql import labels  # Import the labels module
 import usb.core
 import subprocess
 from job_queue import print_queue  # Import from renamed file
+from device_handler import supports_600dpi
+from print_pipeline import trim_whitespace, mm_to_dots, dots_to_mm
+from banner import banner_layout, iter_banner_strips
+from frames import frame_count, iter_dithered_frames
+from classify import choose_dither
+from preview import preview_bytes, preview_file, PREVIEW_WIDTH, THUMB_WIDTH
+from font_fit import load_font, fit_font_size, calibrated_size
+from text_layout import layout_text, best_layout, GREEDY, OPTIMAL
+from label_render import render_label
+from bitmap_font import snap_size
+from qr_render import qr_image
+from barcodes import barcode_image, BARCODE_KINDS, BARCODE_HEIGHT_MM
+from mail_merge import read_csv, MergeLayout, MergeProgress
+from image_store import get_store
+from gallery import get_gallery
+from sticker_template import get_sticker_template
+from txt2img import get_client as get_txt2img_client, queue_when_done
+from image_fetch import fetch_image
+from http_client import cached_get
+from cat_prefetch import get_prefetcher
+from mask_pipeline import MaskParams, mask_pipeline
+from gerber import GERBER_EXTENSIONS, DRILL_EXTENSIONS, parse_gerber, parse_excellon, rasterize
 
 # After the imports, before the functions
 if 'label_type' not in st.session_state:
@@ -92,6 +112,13 @@ def find_and_parse_printer():
     print("No Brother QL printer found")
     return None
 
+def get_printer_model():
+    """Printer model for this session, looked up once"""
+    if "printer_model" not in st.session_state:
+        printer_info = find_and_parse_printer()
+        st.session_state.printer_model = printer_info["model"] if printer_info else None
+    return st.session_state.printer_model
+
 def get_printer_label_info():
     printer_info = find_and_parse_printer()
     if not printer_info:
@@ -236,52 +263,6 @@ label_width = get_label_width(label_type)  # Use the width as label_width
 copy = int(st.query_params.get("copy", [1])[0])  # Default to 1 copy if not specified
 
 
-# Function to list saved images with optional duplicate filtering
-def list_saved_images(filter_duplicates=True):
-    # Get history limit from secrets with default fallback of 15
-    history_limit = st.secrets.get("history_limit", 15)
-    
-    # Get all image files from both temp and labels folders
-    temp_files = glob.glob(os.path.join("temp", "*.[pj][np][g]*"))
-    label_files = glob.glob(os.path.join("labels", "*.[pj][np][g]*"))
-
-    # Combine all image files
-    image_files = temp_files + label_files
-
-    # Filter out test labels and get valid images
-    valid_images = [
-        f for f in image_files 
-        if "write_something" not in os.path.basename(f).lower()
-    ]
-
-    if not filter_duplicates:
-        # Simply return all files sorted by modification time
-        return sorted(valid_images, key=os.path.getmtime, reverse=True)[:history_limit]
-
-    # Create a dictionary to store the latest version of each unique image size
-    unique_images = {}
-
-    for image_path in valid_images:
-        try:
-            # Get file size in bytes
-            file_size = os.path.getsize(image_path)
-            
-            # If this size already exists, compare modification times
-            if file_size in unique_images:
-                existing_time = os.path.getmtime(unique_images[file_size])
-                current_time = os.path.getmtime(image_path)
-                if current_time > existing_time:
-                    unique_images[file_size] = image_path
-            else:
-                unique_images[file_size] = image_path
-        except Exception as e:
-            print(f"Error processing {image_path}: {e}")
-            continue
-
-    # Sort by modification time (newest first)
-    return sorted(unique_images.values(), key=os.path.getmtime, reverse=True)[:history_limit]
-
-
 # Replace the get_fonts function
 def get_fonts():
     """Return list of fonts with 5x5-Tami.ttf as default"""
@@ -308,6 +289,8 @@ def get_fonts():
 def safe_filename(text):
     # Sanitize the text to remove illegal characters and replace spaces with underscores
     sanitized_text = re.sub(r'[<>:"/\\|?*\n\r]+', "", text).replace(" ", "_")
+    # Keep paragraphs under the 255 byte filename limit
+    sanitized_text = sanitized_text.encode()[:120].decode(errors="ignore")
     # Get the current time in epoch format
     epoch_time = int(time.time())
     # Return the filename
@@ -322,40 +305,13 @@ os.makedirs(label_dir, exist_ok=True)
 
 def generate_image(prompt, steps):
     try:
-        # Load a template image from a path (you can modify this path as needed)
-        template_path = "templates/template.png"  # Change this to your template image path
-        image = Image.open(template_path)
-        
-        # Create a drawing context
-        draw = ImageDraw.Draw(image)
-        
-        # You might want to customize these font settings
-        try:
-            font = ImageFont.truetype("fonts/DelaGothicOne-Regular.ttf", size=35)  # Change font path and size as needed
-        except:
-            font = ImageFont.load_default()  # Fallback to default font
-        
-        # Add the prompt text to the image
-        # You can customize position (10,10), color, etc.
-        #draw.text((540, 680), prompt, fill="black", font=font)
-        
-        # Calculate text size
-        text_width = draw.textlength(prompt, font=font)
+        # Template and font are loaded once, only the text band is drawn
+        image = get_sticker_template().render(prompt)
 
-        # Calculate the x position to center the text
-        x = 540 - text_width // 2
-        y = 685  # Your desired y-coordinate
-
-        # Draw the centered text
-        draw.text((x, y), prompt, fill="black", font=font)
-
-        # Optionally save the modified image (similar to original function)
+        # Archive it in the history without waiting for the PNG encode
         current_date = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        temp_dir = "temp"
-        os.makedirs(temp_dir, exist_ok=True)
-        filename = os.path.join(temp_dir, "text2img_" + current_date + ".png")
-        image.save(filename)
-        
+        get_store("temp").save_later(image.copy(), "text2img_" + current_date + ".png")
+
         return image
         
     except Exception as e:
@@ -395,11 +351,32 @@ def preper_image(image, label_width=label_width):
     return grayscale_image, dithered_image
 
 
-def print_image(image, rotate=0, dither=False):
+def print_image(image, rotate=0, dither=False, dpi_600=False, trim=None, nup=False):
     """
     Queue a print job and return the job ID.
     The actual printing will be handled by the print queue worker.
+    dpi_600 images must be 600x600 dpi, twice the label width.
+    trim crops blank tape at both ends, defaults to the auto_trim secret.
+    nup images are printed at their size, packed with other small stickers.
     """
+    if trim is None:
+        trim = st.secrets.get("auto_trim", False)
+
+    tape_saved_mm = 0.0
+    if trim:
+        # Trim along the tape, which is the image width once rotated
+        axis = 1 if rotate in (90, 270) else 0
+        dpi = 600 if dpi_600 else 300
+        across = image.width if axis == 0 else image.height
+        pixels_per_dot = across / (label_width * dpi // 300)
+        margin = int(mm_to_dots(st.secrets.get("trim_margin_mm", 2), dpi) * pixels_per_dot)
+        image, removed = trim_whitespace(
+            image, margin=margin, axis=axis, ink_threshold=250 if dither else 180
+        )
+        tape_saved_mm = dots_to_mm(removed / pixels_per_dot, dpi)
+        if tape_saved_mm >= 0.1:
+            st.caption(f"Auto-trim saved {tape_saved_mm:.1f} mm of tape")
+
     # Ensure the temporary directory exists
     temp_dir = tempfile.gettempdir()
     os.makedirs(temp_dir, exist_ok=True)
@@ -431,9 +408,20 @@ def print_image(image, rotate=0, dither=False):
         dither=dither,
         printer_info=printer_info,
         temp_file_path=temp_file_path,
-        label_type=label_type  # Add label_type to the job parameters
+        label_type=label_type,  # Add label_type to the job parameters
+        dpi_600=dpi_600,
+        tape_saved_mm=tape_saved_mm,
+        nup=nup,
+        label_width=label_width
     )
 
+    return wait_for_job(job_id)
+
+def wait_for_job(job_id, on_wait=None):
+    """
+    Show the status of a queued job until it finishes.
+    on_wait is called on every poll, e.g. to update a progress bar.
+    """
     # Start monitoring job status
     status = print_queue.get_job_status(job_id)
     
@@ -441,6 +429,8 @@ def print_image(image, rotate=0, dither=False):
     status_container = st.empty()
     while status.status in ["pending", "processing"]:
         status_container.info(f"Print job status: {status.status}")
+        if on_wait:
+            on_wait()
         time.sleep(0.5)
         status = print_queue.get_job_status(job_id)
 
@@ -451,6 +441,44 @@ def print_image(image, rotate=0, dither=False):
         status_container.error(f"Print job failed: {status.error}")
         return False
 
+CODE_NUP_MARGIN = mm_to_dots(2)  # white kept around packed codes, their quiet zone
+
+
+def print_nup(image, dither=False, margin=8):
+    """Queue a small sticker to share the tape width with other N-up jobs"""
+    sticker, _ = trim_whitespace(image, margin=margin, axis=1)
+    sticker, _ = trim_whitespace(sticker, margin=margin, axis=0)
+    if sticker.width > label_width // 2:
+        st.warning("Sticker is too wide to share the tape, printing it on its own")
+        return print_image(image, dither=dither)
+    st.info("Waiting a moment for other small stickers to share the tape")
+    return print_image(sticker, dither=dither, nup=True)
+
+def print_pages(pages, rotate=0, dither=False, dpi_600=False, cut=True, on_wait=None):
+    """
+    Queue a multi-page job. pages is an iterable of images, typically a
+    generator, consumed by the print worker one page at a time.
+    """
+    printer_info = find_and_parse_printer()
+    if not printer_info:
+        st.error(
+            "No Brother QL printer found. Please check the connection and try again."
+        )
+        return False
+
+    label_type, _ = get_label_type()
+    job_id = print_queue.add_job(
+        None,
+        rotate=rotate,
+        dither=dither,
+        printer_info=printer_info,
+        pages=pages,
+        label_type=label_type,
+        dpi_600=dpi_600,
+        cut=cut
+    )
+    return wait_for_job(job_id, on_wait)
+
 # Add a new function to show queue status
 def show_queue_status():
     """Show the current print queue status in the UI"""
@@ -492,6 +520,8 @@ def show_queue_status():
                 status_text = f"{status_color} Job {job_id[:8]}: {job_info['status']}"
                 if job_info["error"]:
                     status_text += f" ({job_info['error']})"
+                if job_info["tape_saved_mm"]:
+                    status_text += f" -{job_info['tape_saved_mm']:.0f}mm tape"
                 st.write(status_text)
 
 # Add queue status display to the main UI
@@ -506,12 +536,11 @@ def find_url(string):
     return urls
 
 
-def img_concat_v(im1, im2, image_width=label_width):
-    dst = Image.new("RGB", (im1.width, im1.height + image_width))
+def img_concat_v(im1, im2):
+    # Stack without resampling, a narrower image is centered
+    dst = Image.new("RGB", (im1.width, im1.height + im2.height), color="white")
     dst.paste(im1, (0, 0))
-    im2 = im2.resize((image_width, image_width))
-
-    dst.paste(im2, (0, im1.height))
+    dst.paste(im2, ((im1.width - im2.width) // 2, im1.height))
     return dst
 
 
@@ -521,9 +550,11 @@ def get_cat_breeds():
         return ["API key required"]
     
     try:
-        response = requests.get(
+        # Breeds rarely change, keep them for a day
+        response = cached_get(
             "https://api.thecatapi.com/v1/breeds",
-            headers={"x-api-key": cat_api_key}
+            headers={"x-api-key": cat_api_key},
+            ttl=86400
         )
         breeds = response.json()
         return [breed["name"] for breed in breeds]
@@ -541,36 +572,6 @@ def apply_threshold(image, threshold):
     return image.point(lut, mode='1')
 
 
-def resize_image_to_width(image, target_width_mm, current_dpi=300):
-    # Convert mm to inches (since DPI is dots per inch)
-    target_width_inch = target_width_mm / 25.4
-
-    # Calculate the target pixel width using the given DPI
-    target_width_px = int(target_width_inch * current_dpi)
-
-    # Get current dimensions
-    current_width = image.width
-
-    # Calculate scaling factor based on target width
-    scale_factor = target_width_px / current_width
-
-    # Calculate new height maintaining aspect ratio
-    new_height = int(image.height * scale_factor)
-
-    # Resize the image while maintaining the aspect ratio
-    resized_image = image.resize((target_width_px, new_height), Image.LANCZOS)
-
-    # If the resized width is less than label_width pixels, pad with white
-    if target_width_px < label_width:
-        new_image = Image.new("RGB", (label_width, new_height), (255, 255, 255))
-        new_image.paste(resized_image, ((label_width - target_width_px) // 2, 0))
-        resized_image = new_image
-
-    print(f"Image resized from {image.width}x{image.height} to {resized_image.width}x{resized_image.height} pixels.")
-    print(f"Target width was {target_width_mm}mm ({target_width_px}px)")
-    return resized_image
-
-
 def add_border(image, border_width=1):
     """Add a thin black border around the image"""
     if image.mode == '1':  # Binary image
@@ -583,39 +584,6 @@ def add_border(image, border_width=1):
         return ImageOps.expand(image, border=border_width, fill='black')
 
 
-def apply_levels(image, black_point=0, white_point=255):
-    """Apply levels adjustment to an image"""
-    if image.mode != 'L':
-        image = image.convert('L')
-    
-    # Create lookup table for the transformation
-    lut = []
-    for i in range(256):
-        # Normalize the input range
-        if i <= black_point:
-            lut.append(0)
-        elif i >= white_point:
-            lut.append(255)
-        else:
-            # Linear mapping between black and white points
-            normalized = (i - black_point) / (white_point - black_point)
-            lut.append(int(normalized * 255))
-    
-    return image.point(lut)
-
-
-def apply_histogram_equalization(image, black_point=0, white_point=255):
-    """Apply histogram equalization with levels adjustment to an image"""
-    if image.mode != 'L':
-        image = image.convert('L')
-    
-    # First apply levels adjustment
-    leveled = apply_levels(image, black_point, white_point)
-    
-    # Then apply histogram equalization
-    return ImageOps.equalize(leveled)
-
-
 # Streamlit app
 if not os.path.exists(".streamlit/secrets.toml"):
     st.error("⚠️ No secrets.toml file found!")
@@ -637,7 +605,8 @@ if 'active_tab' not in st.session_state:
     st.session_state.active_tab = 0
 
 tabs = ["Osterlan", "Label", "Image", "Webcam", "Cat", "Mask Pro", "history", "FAQ"]
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(tabs)
+# Tabs track which one is open, so the Cat tab knows when it is shown
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(tabs, key="active_tab_name", on_change="rerun")
 
 # Set the active tab
 if 'selected_image_path' in st.session_state:
@@ -657,6 +626,22 @@ def submit():
         None  # Reset the generated image when a new prompt is entered
     )
 
+def dither_checkbox_for(image, key, source):
+    """
+    Dither checkbox defaulting to the classifier's choice. The image is
+    classified once per source (file id, path or URL) and the default is
+    applied through session state, a user's choice sticks until another
+    image is loaded.
+    """
+    if st.session_state.get(f"{key}_source") != source:
+        image_kind, dither = choose_dither(image)
+        st.session_state[f"{key}_source"] = source
+        st.session_state[f"{key}_kind"] = image_kind
+        st.session_state[key] = dither
+    image_kind = st.session_state[f"{key}_kind"]
+    return st.checkbox(f"Dither - _use for high detail, detected {image_kind.replace('_', ' ')}_", key=key)
+
+
 # sticker
 with tab3:
     st.subheader("Sticker")
@@ -673,18 +658,15 @@ with tab3:
             # Create checkboxes for rotation and dithering
             col1, col2 = st.columns(2)
             with col1:
-                dither_checkbox = st.checkbox(
-                    "Dither - _use for high detail, true by default_", value=True,
-                    key="dither_history"
-                )
+                dither_checkbox = dither_checkbox_for(image_to_process, "dither_history", image_path)
             with col2:
                 rotate_checkbox = st.checkbox("Rotate - _90 degrees_", key="rotate_history")
 
             # Display image based on checkbox status
             if dither_checkbox:
-                st.image(dithered_image, caption="Resized and Dithered Image")
+                st.image(preview_bytes(dithered_image, key=(image_path, label_width, "dithered")), caption="Resized and Dithered Image")
             else:
-                st.image(image_to_process, caption="Original Image")
+                st.image(preview_bytes(image_to_process, key=(image_path, label_width, "original")), caption="Original Image")
 
             # Print button
             button_text = "Print "
@@ -722,27 +704,11 @@ with tab3:
 
     # Function to validate and fetch image from URL
     def fetch_image_from_url(url):
-        if not url.startswith('https://'):
-            st.error('Only HTTPS URLs are allowed for security')
-            return None
-            
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            # Verify content type is an image
-            content_type = response.headers.get('content-type', '')
-            if not content_type.startswith('image/'):
-                st.error('URL does not point to a valid image')
-                return None
-                
-            return Image.open(io.BytesIO(response.content)).convert("RGB")
-        except requests.exceptions.RequestException as e:
-            st.error(f'Error fetching image: {str(e)}')
-            return None
-        except Exception as e:
-            st.error(f'Error processing image: {str(e)}')
+        image, error = fetch_image(url)
+        if error:
+            st.error(error)
             return None
+        return image.convert("RGB")
 
     # Process uploaded file or URL
     if uploaded_image is not None:
@@ -757,20 +723,15 @@ with tab3:
             else "selected_image"
         )
 
-        # grayimage = add_white_background_and_convert_to_grayscale(image_to_process)
-        grayscale_image, dithered_image = preper_image(image_to_process)
-
         # Paths to save the original and dithered images in the 'temp' directory with postfix
         original_image_path = os.path.join(
             "temp", original_filename_without_extension + "_original.png"
         )
 
-        # Create checkboxes for rotation and dithering (dither default to True) inline
+        # Create checkboxes for rotation and dithering (dither only photos by default) inline
         col1, col2 = st.columns(2)
         with col1:
-            dither_checkbox = st.checkbox(
-                "Dither - _use for high detail, true by default_", value=True
-            )
+            dither_checkbox = dither_checkbox_for(image_to_process, "dither_upload", uploaded_image.file_id)
         with col2:
             rotate_checkbox = st.checkbox("Rotate - _90 degrees_")
 
@@ -788,17 +749,63 @@ with tab3:
             dither_value = dither_checkbox
             print_image(image_to_process, rotate=rotate_value, dither=dither_value)
 
-        # Display image based on checkbox status
-        if dither_checkbox:
-            st.image(dithered_image, caption="Resized and Dithered Image")
+        # Animated GIF/WebP: print the frames as a flipbook, one page each
+        animation = Image.open(io.BytesIO(uploaded_image.getvalue()))
+        frames_total = frame_count(animation)
+        if frames_total > 1:
+            flipbook_checkbox = st.checkbox(f"Flipbook - _print all {frames_total} frames_")
+            if flipbook_checkbox:
+                colf1, colf2 = st.columns(2)
+                with colf1:
+                    frame_step = st.number_input("Use every n-th frame", min_value=1, max_value=frames_total, value=1)
+                with colf2:
+                    max_frames = st.number_input("Max frames", min_value=1, max_value=frames_total, value=min(frames_total, 24))
+                frames_printed = min(len(range(0, frames_total, frame_step)), max_frames)
+                if st.button(f"Print Flipbook ({frames_printed} frames)", key="print_flipbook"):
+                    frame_width = label_width
+                    if rotate_checkbox:
+                        # Rotated frames run across the tape, fit their height instead
+                        frame_width = max(1, int(label_width * animation.width / animation.height))
+                    pages = iter_dithered_frames(animation, frame_width, frame_step, max_frames)
+                    print_pages(pages, rotate=90 if rotate_checkbox else 0, dither=False)
+
+        # Banner mode: tall images go out as a stream of label-length strips
+        banner_checkbox = st.checkbox("Banner - _print tall images as separate strips_")
+        if banner_checkbox:
+            colb1, colb2, colb3 = st.columns(3)
+            with colb1:
+                strip_mm = st.number_input("Strip length (mm)", min_value=20, value=150)
+            with colb2:
+                overlap_mm = st.number_input("Overlap (mm)", min_value=0, value=0)
+            with colb3:
+                marks_checkbox = st.checkbox("Alignment marks", value=True)
+
+            # Strips are cut from the source and turned one at a time, never the whole image
+            banner_rotate = 90 if rotate_checkbox else 0
+            strip_count = len(banner_layout(
+                image_to_process, label_width, mm_to_dots(strip_mm), mm_to_dots(overlap_mm), banner_rotate
+            ))
+            if st.button(f"Print Banner ({strip_count} strips)", key="print_banner"):
+                print_pages(
+                    iter_banner_strips(image_to_process, label_width, strip_mm, overlap_mm, marks_checkbox, rotate=banner_rotate),
+                    dither=dither_checkbox,
+                )
+
+        # Display image based on checkbox status, a banner only gets a small preview of its source
+        if banner_checkbox:
+            st.image(preview_bytes(image_to_process, width=THUMB_WIDTH, key=(uploaded_image.file_id, "banner")), caption=f"Banner source, {strip_count} strips")
+        elif dither_checkbox:
+            grayscale_image, dithered_image = preper_image(image_to_process)
+            st.image(preview_bytes(dithered_image, key=(uploaded_image.file_id, label_width, "dithered")), caption="Resized and Dithered Image")
         else:
-            st.image(image_to_process, caption="Original Image")
+            st.image(preview_bytes(image_to_process, key=(uploaded_image.file_id, label_width, "original")), caption="Original Image")
 
         # Create 'temp' directory if it doesn't exist
         os.makedirs("temp", exist_ok=True)
         
         # Save original image
         image_to_process.save(original_image_path, "PNG")
+        get_gallery().add(original_image_path)
     elif image_url:
         # Try to fetch and process image from URL
         image_to_process = fetch_image_from_url(image_url)
@@ -811,10 +818,7 @@ with tab3:
             # Create checkboxes for rotation and dithering
             col1, col2 = st.columns(2)
             with col1:
-                dither_checkbox = st.checkbox(
-                    "Dither - _use for high detail, true by default_", value=True,
-                    key="dither_url"
-                )
+                dither_checkbox = dither_checkbox_for(image_to_process, "dither_url", image_url)
             with col2:
                 rotate_checkbox = st.checkbox("Rotate - _90 degrees_", key="rotate_url")
 
@@ -834,13 +838,14 @@ with tab3:
 
             # Display image based on checkbox status
             if dither_checkbox:
-                st.image(dithered_image, caption="Resized and Dithered Image")
+                st.image(preview_bytes(dithered_image, key=(image_url, label_width, "dithered")), caption="Resized and Dithered Image")
             else:
-                st.image(image_to_process, caption="Original Image")
+                st.image(preview_bytes(image_to_process, key=(image_url, label_width, "original")), caption="Original Image")
 
             # Save original image
             original_image_path = os.path.join("temp", filename)
             image_to_process.save(original_image_path, "PNG")
+            get_gallery().add(original_image_path)
 
 # label
 with tab2:
@@ -848,70 +853,15 @@ with tab2:
 
     img = ""
 
-    # Function to calculate the actual image height based on the bounding boxes of each line
-    def calculate_actual_image_height_with_empty_lines(text, font, line_spacing=10):
-        draw = ImageDraw.Draw(
-            Image.new("RGB", (1, 1), color="white")
-        )  # Dummy image for calculation
-        total_height = 0
-
-        # Get font metrics for consistent spacing
-        ascent, descent = font.getmetrics()
-        font_height = ascent + descent
-
-        for line in text.split("\n"):
-            if line.strip():  # Non-empty lines
-                # Use textbbox for more accurate measurements
-                bbox = draw.textbbox((0, 0), line, font=font)
-                text_height = max(
-                    bbox[3] - bbox[1], font_height
-                )  # Use the larger of bbox height or font height
-            else:  # Empty lines
-                text_height = font_height
-
-            total_height += text_height + line_spacing
-
-        # Add padding at top and bottom
-        padding = 20
-        return total_height + (padding * 2)  # Add padding to total height
-
-    # Function to calculate the maximum font size based on the width of the longest line
-    def calculate_max_font_size(
-        width, text, font_path, start_size=10, end_size=200, step=1
-    ):
-        try:
-            draw = ImageDraw.Draw(
-                Image.new("RGB", (1, 1), color="white")
-            )  # Dummy image for calculation
-            max_font_size = start_size
-
-            for size in range(start_size, end_size, step):
-                try:
-                    font = ImageFont.truetype(font_path, size)
-                except OSError:
-                    # If can't load font, use default
-                    return 50  # Return reasonable default size
-                adjusted_lines = []
-                for line in text.split("\n"):
-                    adjusted_lines.append(line)
-
-                max_text_width = max(
-                    [
-                        draw.textbbox((0, 0), line, font=font)[2]
-                        for line in adjusted_lines
-                        if line.strip()
-                    ]
-                )
-
-                if max_text_width <= width:
-                    max_font_size = size
-                else:
-                    break
+    def keep_label(image, text):
+        """Save a label to the history, once per distinct image"""
+        if text.strip() == "write something":
+            return
+        path, created = get_store(label_dir).save(image, safe_filename(text))
+        if created:
+            st.success(f"Label saved as {os.path.basename(path)}")
 
-            return max_font_size
-        except Exception as e:
-            print(f"Error in calculate_max_font_size: {e}")
-            return 50  # Return reasonable default size if anything fails
+    qr_data = []  # QR blocks printed below the label
 
     # Multiline Text Input
     text = st.text_area("Enter your text to print", "write something\n", height=200)
@@ -919,9 +869,12 @@ with tab2:
     if text:
         urls = find_url(text)
         if urls:
-            st.success("Found URLs: we might automate the QR code TODO")
-            for url in urls:
-                st.write(url)
+            auto_qr = st.checkbox(
+                f"QR codes for {len(urls)} URL{'s' if len(urls) > 1 else ''} found in the text",
+                value=True, key="auto_qr"
+            )
+            if auto_qr:
+                qr_data.extend(urls)
 
         # init some font vars
         fonts = get_fonts()
@@ -934,7 +887,7 @@ with tab2:
 
         try:
             # Try to load the font
-            test_font = ImageFont.truetype(font, 12)
+            test_font = load_font(font, 12)
         except OSError:
             st.error("5x5-Tami.ttf font not found! Please ensure the fonts directory exists and contains 5x5-Tami.ttf")
             st.info("You can download it from the project repository")
@@ -943,50 +896,40 @@ with tab2:
         if font is None:
             st.stop()  # Stop execution if font is not available
 
-        # Calculate initial max size with default font
+        wrap_options = {"manual": None, "wrap": GREEDY, "balanced wrap": OPTIMAL}
+        wrap_choice = st.radio(
+            "Line breaks - _manual shrinks the font to fit the longest line_",
+            list(wrap_options), horizontal=True, key="wrap_mode"
+        )
+        wrap_mode = wrap_options[wrap_choice]
+
+        auto_layout = st.checkbox(
+            "Auto layout - _biggest text within a tape length, rotates if that prints bigger_",
+            key="auto_layout"
+        )
+        if auto_layout:
+            max_length_mm = st.number_input("Max tape length (mm)", min_value=20, max_value=1000, value=100, step=10)
+            max_length = mm_to_dots(max_length_mm)
+
+        def fit_label(font):
+            """Font size for the current text, plus the auto layout if enabled"""
+            if auto_layout:
+                layout = best_layout(text, font, label_width, max_length, line_spacing=20, padding=20)
+                if layout:
+                    return layout.size, layout
+                st.warning("Text does not fit the max tape length, falling back to the label width")
+            if wrap_mode:
+                # Wrapped text keeps the base size
+                return calibrated_size(font, label_width), None
+            # Fit the longest line to the label width
+            return max(fit_font_size(text, font, label_width), 20), None  # Ensure minimum size of 20
+
+        layout = None
         try:
-            # Get the longest line length
-            chars_per_line = max(len(line) for line in text.split('\n'))
-            if chars_per_line == 0:
-                chars_per_line = 1
-            
-            print(f"Debug font sizing:")
-            print(f"- Label type: {label_type}")
-            print(f"- Label width: {label_width} dots")
-            print(f"- Longest line: {chars_per_line} characters")
-            
-            # Base sizes for different label types
-            if label_type == "62":  # 62mm label
-                base_font_size = 60
-                base_width = 696
-            elif label_type == "102":  # 102mm label
-                base_font_size = 107
-                base_width = 1164
-            else:
-                # For other sizes, scale from 62mm base
-                base_font_size = 60
-                base_width = 696
-            
-            # First scale based on width ratio
-            width_scale = label_width / base_width
-            scaled_base_size = int(base_font_size * width_scale)
-            
-            # Then scale based on text length (14 chars is our reference)
-            base_text_length = 14  # "write something" length
-            text_scale = base_text_length / chars_per_line
-            font_size = int(scaled_base_size * text_scale)
-            
-            # Ensure minimum size of 20
-            font_size = max(font_size, 20)
-            
-            print(f"- Base font size: {base_font_size}")
-            print(f"- Width scale: {width_scale:.2f}")
-            print(f"- Text scale: {text_scale:.2f}")
-            print(f"- Final font size: {font_size}")
-            
+            font_size, layout = fit_label(font)
             max_size = font_size
         except Exception as e:
-            max_size = 60  # Default to known good size for 62mm
+            max_size = 50  # Reasonable default if the font cannot be measured
             font_size = max_size
             print(f"Error calculating font size: {e}")
 
@@ -1017,36 +960,17 @@ with tab2:
                 )
             # Recalculate max size if font changed
             try:
-                if font == "fonts/5x5-Tami.ttf":
-                    chars_per_line = max(len(line) for line in text.split('\n'))
-                    if chars_per_line == 0:
-                        chars_per_line = 1
-                    # Use same calculation as above for consistency
-                    if label_type == "62":  # 62mm label
-                        font_size = 60
-                    elif label_type == "102":  # 102mm label
-                        font_size = 107
-                    else:
-                        # For other sizes, scale based on width ratio from 62mm label
-                        base_width = 696  # Width of 62mm label
-                        width_scale = label_width / base_width
-                        font_size = int(60 * width_scale)  # Scale from base size of 60
-                    
-                    print(f"Font size recalculated:")
-                    print(f"- Label type: {label_type}")
-                    print(f"- Label width: {label_width} dots")
-                    print(f"- Font size: {font_size}")
-                    
-                    max_size = font_size
-                else:
-                    max_size = calculate_max_font_size(label_width, text, font)
+                max_size, layout = fit_label(font)
             except Exception as e:
                 print(f"Error calculating font size for {font}: {e}")
             font_size = st.slider("Font Size", 20, max_size + 50, max_size)
 
+        # Pixel fonts print at a whole number of dots per font pixel
+        font_size = snap_size(font, font_size)
+
         # Font Size
         try:
-            fnt = ImageFont.truetype(font, font_size)
+            fnt = load_font(font, font_size)
         except OSError:
             # If the 5x5 font is not found, try to use default system font
             try:
@@ -1055,91 +979,157 @@ with tab2:
             except Exception as e:
                 st.error(f"Error loading font: {e}")
         line_spacing = 20  # Adjust this value to set the desired line spacing
-
-        # Calculate the new image height based on the bounding boxes
-        new_image_height = calculate_actual_image_height_with_empty_lines(
-            text, fnt, line_spacing
+        padding = 20  # Space above and below the text block
+
+        label_text = text
+        render_width = label_width
+        if layout:
+            # Rotated labels are drawn along the tape, then turned to the label width
+            if layout.rotate:
+                render_width = layout.width + 2 * padding if font_size == layout.size else max_length
+            if font_size == layout.size:
+                label_text = "\n".join(layout.lines)
+            elif layout.wrapped:
+                label_text = "\n".join(layout_text(text, font, font_size, render_width))
+        elif wrap_mode and isinstance(fnt, ImageFont.FreeTypeFont):
+            label_text = "\n".join(layout_text(text, font, font_size, label_width, wrap_mode))
+
+        # Cached render, unchanged input on a rerun skips drawing
+        img = render_label(
+            label_text, font, font_size, alignment, render_width, line_spacing, padding,
+            rotate=90 if layout and layout.rotate else 0, label_width=label_width,
         )
-
-        # Create Image with padding
-        padding = 20  # Consistent with the padding in calculate_actual_image_height
-        img = Image.new("RGB", (label_width, new_image_height), color="white")
-        d = ImageDraw.Draw(img)
-
-        # Adjust starting y position to account for padding
-        y = padding  # Start from padding instead of 5
-
-        # Draw Text
-        for line in text.split("\n"):
-            text_width = 0
-            ascent, descent = fnt.getmetrics()
-            font_height = ascent + descent
-
-            if line.strip():  # For non-empty lines
-                bbox = d.textbbox((0, y), line, font=fnt)
-                text_width = bbox[2] - bbox[0]
-                text_height = max(bbox[3] - bbox[1], font_height)
-            else:  # For empty lines
-                text_height = font_height
-
-            if alignment == "center":
-                x = (label_width - text_width) // 2
-            elif alignment == "right":
-                x = label_width - text_width
-            else:
-                x = 0
-
-            d.text((x, y), line, font=fnt, fill=(0, 0, 0))
-            y += text_height + line_spacing
-
-        # Save the label image
-        if text != "write something":
-            filename = safe_filename(text)
-            file_path = os.path.join(label_dir, filename)
-            img.save(file_path, "PNG")
-            st.success(f"Label saved as {filename}")
+        if layout and layout.rotate:
+            st.caption(f"Auto layout: rotated, font size {layout.size}, {dots_to_mm(img.height):.0f} mm of tape")
 
     # QR code
-    qr = qrcode.QRCode(border=0)
-
     qrurl = st.text_input(
         "add a QRcode to your sticker",
     )
-    if qrurl:
-        # we have text generate qr
-        qr.add_data(qrurl)
-        qr.make(fit=True)
-        imgqr = qr.make_image(fill_color="black", back_color="white")
-
-        # save to image
-        # add random 4 letetrs to file name
-        # letters = string.ascii_lowercase
-        # random_string = ''.join(random.choice(letters) for i in range(4))
-        # qrimgpath = os.path.join('temp', "qr_" + random_string + '.png')
-        # imgqr.save(qrimgpath, "PNG")
+    if qrurl and qrurl not in qr_data:
+        qr_data.insert(0, qrurl)
+
+    # Barcode
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        barcode_kind = st.selectbox("Barcode type", list(BARCODE_KINDS), key="barcode_kind")
+    with col2:
+        barcode_data = st.text_input("add a barcode to your sticker", key="barcode_data")
+
+    nup_checkbox = False
+    if text or qr_data or barcode_data:
+        nup_checkbox = st.checkbox(
+            "N-up - _pack short labels side by side with other small stickers_",
+            key="nup_label"
+        )
+
+    if qr_data or barcode_data:
+        # Native resolution QR and barcode blocks, whole dots per module, stacked below the label.
+        # N-up codes are drawn to fit half the tape with their margin, so they can share it
+        code_width = label_width // 2 - 2 * CODE_NUP_MARGIN if nup_checkbox else label_width
+        imgqr = img
+        try:
+            blocks = [qr_image(data, width=code_width) for data in qr_data]
+            if barcode_data:
+                blocks.append(barcode_image(
+                    BARCODE_KINDS[barcode_kind], barcode_data, width=code_width, height=mm_to_dots(BARCODE_HEIGHT_MM)
+                ))
+            for block in blocks:
+                block = block.convert("RGB")
+                imgqr = img_concat_v(imgqr, block) if imgqr else block
+        except ValueError as e:
+            st.error(f"Code: {e}")
+            imgqr = None
 
         if imgqr and img:
-            # add qr below the label
-            imgqr = img_concat_v(img, imgqr)
             st.image(imgqr, use_container_width=True)
-            if st.button("Print sticker+qr", key="print_sticker_qr"):
-                print_image(imgqr)
+            if st.button("Print sticker+code", key="print_sticker_qr"):
+                keep_label(imgqr, text)
+                if nup_checkbox:
+                    print_nup(imgqr, margin=CODE_NUP_MARGIN)
+                else:
+                    print_image(imgqr)
         elif imgqr and not (img):
+            st.image(imgqr, use_container_width=True)
             if st.button("Print sticker", key="print_qr_only"):
-                print_image(imgqr)
+                if nup_checkbox:
+                    print_nup(imgqr, margin=CODE_NUP_MARGIN)
+                else:
+                    print_image(imgqr)
 
-    if text and not (qrurl):
+    if text and not (qr_data or barcode_data):
         st.image(img, use_container_width=True)
-        if st.button("Print sticker", key="print_text_only"):
-            print_image(img)  # Needs definition
-            st.success("sticker sent to printer")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Print sticker", key="print_text_only"):
+                keep_label(img, text)
+                if nup_checkbox:
+                    print_nup(img)
+                else:
+                    print_image(img)  # Needs definition
+                st.success("sticker sent to printer")
+        with col2:
+            if st.button("Keep in history", key="keep_label"):
+                keep_label(img, text)
     st.markdown(
         """
-                * label will automaticly resize to fit the longest line, so use linebreaks.
+                * label will automaticly resize to fit the longest line, so use linebreaks. or pick a wrap mode for paragraphs.
                 * on pc `ctrl+enter` will submit, on mobile click outside the `text_area` to process.
                 """
     )
 
+    with st.expander("Batch print from CSV"):
+        csv_file = st.file_uploader("CSV with a header row", type=["csv"], key="merge_csv")
+        if csv_file is not None:
+            columns, rows = read_csv(csv_file.getvalue())
+            st.caption(f"{len(rows)} rows, columns: {', '.join(columns)}")
+            merge_template = st.text_area(
+                "Label text, {column} is replaced by each row's value",
+                "\n".join("{%s}" % column for column in columns[:2]),
+                key="merge_template"
+            )
+            merge_header = st.text_input("Header printed on every label", key="merge_header")
+            merge_qr = st.selectbox("QR code from column", ["none"] + columns, key="merge_qr")
+            merge_font = st.session_state.get("selected_font", get_fonts()[0])
+
+            # Compile the layout once per CSV and settings, not per rerun or row
+            merge_key = (hashlib.sha1(csv_file.getvalue()).hexdigest(), merge_template, merge_header, merge_qr, merge_font, label_width)
+            if st.session_state.get("merge_key") != merge_key:
+                try:
+                    st.session_state.merge_layout = MergeLayout(
+                        merge_template, rows, merge_font, label_width, header=merge_header,
+                        qr_column=None if merge_qr == "none" else merge_qr,
+                    )
+                except (ValueError, KeyError, IndexError) as e:
+                    st.session_state.merge_layout = None
+                    st.error(f"Template error: {e}")
+                st.session_state.merge_key = merge_key
+                st.session_state.merge_resume = 1
+            merge_layout = st.session_state.merge_layout
+
+            if merge_layout and rows:
+                st.image(merge_layout.render(rows[0]), caption=f"Row 1, font size {merge_layout.font_size}", use_container_width=True)
+                start_row = st.number_input(
+                    "Start at row", min_value=1, max_value=len(rows),
+                    value=min(st.session_state.merge_resume, len(rows)), key=f"merge_start_{st.session_state.merge_resume}"
+                )
+                if st.button(f"Print rows {start_row}-{len(rows)}", key="print_merge"):
+                    progress = MergeProgress(total=len(rows), start_row=start_row - 1)
+                    progress_bar = st.progress(0.0)
+
+                    def show_progress():
+                        done = progress.next_row
+                        progress_bar.progress(done / len(rows), text=f"Printed {done} of {len(rows)}")
+
+                    if print_pages(merge_layout.iter_pages(start_row - 1, progress), on_wait=show_progress):
+                        show_progress()
+                        st.session_state.merge_resume = 1
+                        st.success(f"Printed {progress.sent} labels")
+                    else:
+                        # The row being printed failed, everything before it was sent
+                        st.session_state.merge_resume = progress.next_row + 1
+                        st.error(f"Batch stopped at row {progress.next_row + 1}, start there to resume")
+
 # text2img
 with tab1:
     st.subheader(":computer: OSTERLAN 2025 Sticker")
@@ -1167,6 +1157,44 @@ with tab1:
     # Update last prompt
     st.session_state.last_prompt = prompt
 
+    with st.expander("text2image (Stable Diffusion)"):
+        sd_prompt = st.text_input("Prompt", key="sd_prompt")
+        sd_steps = st.slider("Steps", 5, 60, 30, key="sd_steps")
+        sd_seed = st.number_input("Seed, -1 for random", min_value=-1, value=-1, step=1, key="sd_seed")
+        if st.button("Generate and print", key="sd_generate", disabled=not sd_prompt.strip()):
+            printer_info = find_and_parse_printer()
+            if not printer_info:
+                st.error(
+                    "No Brother QL printer found. Please check the connection and try again."
+                )
+            else:
+                label_type, _ = get_label_type()
+                # Returns at once, the sticker is queued when the image arrives
+                generation = get_txt2img_client(txt2img_url).generate(sd_prompt.strip(), sd_steps, int(sd_seed))
+                sd_job = queue_when_done(
+                    generation, print_queue, lambda image: preper_image(image.convert("RGB"))[0],
+                    rotate=0, dither=True, printer_info=printer_info, label_type=label_type,
+                )
+                st.session_state.sd_request = (sd_prompt.strip(), generation, sd_job)
+
+        if st.session_state.get("sd_request"):
+            sd_text, generation, sd_job = st.session_state.sd_request
+            if not generation.done():
+                st.info(f"Generating '{sd_text}', the sticker prints as soon as it is ready")
+                st.button("Check again", key="sd_check")
+            elif generation.exception() is not None:
+                st.error(f"text2image failed: {generation.exception()}")
+            else:
+                st.image(preview_bytes(generation.result()), caption=sd_text)
+                if not sd_job.done():
+                    st.caption("Queueing print job")
+                elif sd_job.exception() is not None:
+                    st.error(f"Could not queue the print: {sd_job.exception()}")
+                else:
+                    status = print_queue.get_job_status(sd_job.result())
+                    if status is not None:
+                        st.caption(f"Print job status: {status.status}" + (f" ({status.error})" if status.error else ""))
+
 # webcam
 with tab4:
     st.subheader(":printer: a snapshot")
@@ -1174,15 +1202,17 @@ with tab4:
     if on:
         picture = st.camera_input("Take a picture")
         if picture is not None:
+            picture_id = picture.file_id
             picture = Image.open(picture).convert("RGB")
             grayscale_image, dithered_image = preper_image(picture)
 
-            st.image(dithered_image, caption="Resized and Dithered Image")
+            st.image(preview_bytes(dithered_image, key=(picture_id, label_width, "dithered")), caption="Resized and Dithered Image")
 
             # Save webcam image before printing
             filename = safe_filename("webcam")
             file_path = os.path.join(label_dir, filename)
             picture.save(file_path, "PNG")
+            get_gallery().add(file_path)
             st.success(f"Webcam photo saved as {filename}")
 
             # print options
@@ -1214,30 +1244,28 @@ with tab5:
         st.warning("⚠️ Cat API key is not configured")
         st.info("Add your cat_api_key to .streamlit/secrets.toml")
     else:
+        # Background ring of ready cats, started once someone opens this tab
+        # so visitors of the other tabs never use the API quota
+        cat_prefetcher = get_prefetcher(cat_api_key, preper_image, label_width) if tab5.open else None
         if st.button("Fetch cat"):
             try:
-                # Get cat image URL
-                response = requests.get(
-                    "https://api.thecatapi.com/v1/images/search",
-                    headers={"x-api-key": cat_api_key}
-                )
-                response.raise_for_status()
-                image_url = response.json()[0]["url"]
+                cat_prefetcher = cat_prefetcher or get_prefetcher(cat_api_key, preper_image, label_width)
+                cat = cat_prefetcher.pop(label_width)
+                if cat is None:
+                    # Ring is empty (first visit or quota pause), fetch directly
+                    cat = cat_prefetcher.fetch_now(label_width)
+                grayscale_image, dithered_image = cat
 
-                # Download and process image
-                img = Image.open(io.BytesIO(requests.get(image_url).content)).convert('RGB')
-                grayscale_image, dithered_image = preper_image(img)
-                
                 # Store in session state
                 st.session_state.cat_image = grayscale_image
                 st.session_state.cat_dithered = dithered_image
-                
+
             except Exception as e:
                 st.error(f"Error fetching cat: {str(e)}")
         
         # Show image and print button if we have a cat
         if st.session_state.cat_dithered is not None:
-            st.image(st.session_state.cat_dithered, caption="Cat!")
+            st.image(preview_bytes(st.session_state.cat_dithered), caption="Cat!")
             if st.button("Print Cat", key="print_cat"):
                 print_image(st.session_state.cat_image, dither=True)
                 st.success("Cat sent to printer!")
@@ -1250,6 +1278,11 @@ with tab6:
     uploaded_file = st.file_uploader("Choose an image for mask...", type=["jpg", "jpeg", "png", "gif", "webp", "bmp"], key="mask_uploader")
     image_url = st.text_input("Or enter an HTTPS image URL to fetch and process", key="mask_url")
 
+    # PCB artwork straight from the EDA tool
+    with st.expander("Gerber / drill files"):
+        gerber_file = st.file_uploader("Copper layer (RS-274X Gerber)", type=GERBER_EXTENSIONS, key="gerber_uploader")
+        drill_file = st.file_uploader("Drill file (Excellon, optional)", type=DRILL_EXTENSIONS, key="drill_uploader")
+
     # Initialize image variable
     image = None
 
@@ -1258,35 +1291,75 @@ with tab6:
             # Process uploaded file
             image = Image.open(uploaded_file)
         elif image_url:
-            # Validate and fetch image from URL
-            if not image_url.startswith('https://'):
-                st.error('Only HTTPS URLs are allowed for security')
-            else:
-                try:
-                    response = requests.get(image_url, timeout=10)
-                    response.raise_for_status()
-                    
-                    # Verify content type is an image
-                    content_type = response.headers.get('content-type', '')
-                    if not content_type.startswith('image/'):
-                        st.error('URL does not point to a valid image')
-                    else:
-                        image = Image.open(io.BytesIO(response.content))
-                except requests.exceptions.RequestException as e:
-                    st.error(f'Error fetching image: {str(e)}')
-                except Exception as e:
-                    st.error(f'Error processing image: {str(e)}')
+            # Stream the image with size limits
+            image, error = fetch_image(image_url)
+            if error:
+                st.error(error)
     except Exception as e:
         st.error(f'Error loading image: {str(e)}')
         st.info("Please try another image or format")
 
+    if gerber_file is not None:
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            mirror_checkbox = st.checkbox("Mirror Mask", value=False, key="gerber_mirror")
+            invert_checkbox = st.checkbox("Invert Image", value=False, key="gerber_invert")
+            border_checkbox = st.checkbox("Show border in preview", value=True, key="gerber_border")
+            hires_supported = supports_600dpi(get_printer_model())
+            hires_checkbox = st.checkbox(
+                "600 dpi - keep fine traces", value=False, disabled=not hires_supported,
+                key="gerber_hires", help="Only available on printers with high resolution mode"
+            )
+            dpi = 600 if (hires_checkbox and hires_supported) else 300
+
+        # Rasterize at the printer dot pitch, mirror and invert are part of the fill
+        gerber_key = (
+            hashlib.sha1(gerber_file.getvalue()).hexdigest(),
+            hashlib.sha1(drill_file.getvalue()).hexdigest() if drill_file else None,
+            mirror_checkbox, invert_checkbox, label_width, dpi,
+        )
+        if st.session_state.get("gerber_key") != gerber_key:
+            try:
+                artwork = parse_gerber(gerber_file.getvalue().decode("ascii", errors="ignore"))
+                if drill_file is not None:
+                    parse_excellon(drill_file.getvalue().decode("ascii", errors="ignore"), artwork)
+                for warning in artwork.warnings:
+                    st.warning(warning)
+                st.session_state.gerber_mask = rasterize(
+                    artwork, dpi=dpi, label_width=label_width * dpi // 300,
+                    mirror=mirror_checkbox, invert=invert_checkbox
+                )
+                st.session_state.gerber_key = gerber_key
+            except Exception as e:
+                st.error(f"Error rasterizing Gerber: {str(e)}")
+                st.session_state.gerber_mask = None
+                st.session_state.gerber_key = None
+
+        gerber_mask = st.session_state.get("gerber_mask")
+        if gerber_mask is not None:
+            with col2:
+                preview_image = add_border(gerber_mask) if border_checkbox else gerber_mask
+                preview = preview_bytes(preview_image, key=("gerber", st.session_state.gerber_key, border_checkbox))
+                st.image(preview, caption=f"Preview, {gerber_mask.height / dpi * 25.4:.1f} mm long", use_container_width=True)
+
+            print_button_label = "Print Gerber Mask"
+            if mirror_checkbox:
+                print_button_label += ", Mirrored"
+            if invert_checkbox:
+                print_button_label += ", Inverted"
+            if dpi == 600:
+                print_button_label += ", 600 dpi"
+            if st.button(print_button_label, key="print_gerber"):
+                print_image(gerber_mask, rotate=0, dither=False, dpi_600=dpi == 600)
+                st.success("Print job sent to printer!")
+
     if image is not None:
-            if image.mode == "RGBA":
-                # Handle transparency
-                background = Image.new("RGBA", image.size, "white")
-                image = Image.alpha_composite(background, image)
-            image = image.convert("RGB")
-            
+            # Identify the source so the resize stage is reused across reruns
+            if uploaded_file is not None:
+                source_key = hashlib.sha1(uploaded_file.getvalue()).hexdigest()
+            else:
+                source_key = image_url
+
             col1, col2 = st.columns([1, 1])
 
             with col1:
@@ -1300,23 +1373,23 @@ with tab6:
                 
                 # Add target width in mm option
                 target_width_mm = st.number_input("Target Width (mm)", min_value=0, value=0)
-                
-                # Disable rotation if target width is specified
-                rotate_disabled = target_width_mm > 0
+
+                # 300x600 dpi needs printer support, the mask is built twice as wide
+                hires_supported = supports_600dpi(get_printer_model())
+                hires_checkbox = st.checkbox(
+                    "600 dpi - keep fine traces", value=False, disabled=not hires_supported,
+                    help="Only available on printers with high resolution mode"
+                )
+                dpi = 600 if (hires_checkbox and hires_supported) else 300
+                dots_width = label_width * dpi // 300
+
+                # Disable rotation if target width or 600 dpi is specified
+                rotate_disabled = target_width_mm > 0 or dpi == 600
                 rotate_checkbox = st.checkbox("rotate 90deg", value=False, disabled=rotate_disabled)
                 if rotate_disabled and rotate_checkbox:
-                    st.info("Rotation disabled when target width is specified")
-                
-                # Apply target width resizing if specified
-                if target_width_mm > 0:
-                    image = resize_image_to_width(image, target_width_mm)
-                
-                if mirror_checkbox:
-                    image = ImageOps.mirror(image)
-
-                if invert_checkbox:
-                    image = ImageOps.invert(image)
+                    st.info("Rotation disabled when target width or 600 dpi is specified")
 
+                black_point, white_point = 0, 255
                 if equalize_checkbox:
                     st.text("Levels Adjustment:")
                     col_levels1, col_levels2 = st.columns(2)
@@ -1325,27 +1398,47 @@ with tab6:
                     with col_levels2:
                         white_point = st.slider("White Point", 0, 255, 255)
 
-                # Apply histogram equalization if selected
-                if equalize_checkbox:
-                    image = apply_histogram_equalization(image, black_point, white_point)
+                # Target width in printer dots, otherwise fit the label
+                if target_width_mm > 0:
+                    width_px = int(target_width_mm / 25.4 * dpi)
+                elif print_choice == "Original" or dpi == 600:
+                    width_px = dots_width
+                else:
+                    width_px = 0
 
-                # Process image based on choice
+                dither = False
+                threshold = -1
                 if print_choice == "Original":
                     dither = st.checkbox("Dither - approximate grey tones with dithering", value=True)
-                    grayscale_image, dithered_image = preper_image(image)
-                    display_image = dithered_image if dither else grayscale_image
                 else:  # Threshold
                     threshold_percent = st.slider("Threshold (%)", 0, 100, 50)
                     threshold = int(threshold_percent * 255 / 100)
-                    display_image = apply_threshold(image, threshold)
+
+                # Resize, mirror, invert, levels, equalize and threshold in one LUT pass
+                mask_params = MaskParams(
+                    width_px=width_px,
+                    pad_to=dots_width if target_width_mm > 0 else 0,
+                    mirror=mirror_checkbox,
+                    invert=invert_checkbox,
+                    equalize=equalize_checkbox,
+                    black_point=black_point,
+                    white_point=white_point,
+                    threshold=threshold,
+                    dither=dither,
+                    dpi=dpi,
+                )
+                grayscale_image, display_image = mask_pipeline.render(
+                    image, source_key, mask_params
+                )
 
                 # Create a copy for display with border if needed
-                preview_image = display_image.copy()
+                preview_image = display_image
                 if border_checkbox:
                     preview_image = add_border(preview_image)
 
             with col2:
-                st.image(preview_image, caption="Preview", use_container_width=True)
+                preview = preview_bytes(preview_image, key=("mask", source_key, mask_params, border_checkbox))
+                st.image(preview, caption="Preview", use_container_width=True)
 
             print_button_label = f"Print {print_choice} Image"
             if print_choice == "Original" and dither:
@@ -1358,13 +1451,15 @@ with tab6:
                 print_button_label += ", Inverted"
             if target_width_mm > 0:
                 print_button_label += f", Width: {target_width_mm}mm"
+            if dpi == 600:
+                print_button_label += ", 600 dpi"
 
             if st.button(print_button_label):
                 rotate = 90 if (rotate_checkbox and not rotate_disabled) else 0
                 if print_choice == "Original":
-                    print_image(grayscale_image, rotate=rotate, dither=dither)
+                    print_image(grayscale_image, rotate=rotate, dither=dither, dpi_600=dpi == 600)
                 else:
-                    print_image(display_image, rotate=rotate, dither=False)
+                    print_image(display_image, rotate=rotate, dither=False, dpi_600=dpi == 600)
                 st.success("Print job sent to printer!")
 
 # history tab
@@ -1374,8 +1469,6 @@ with tab7:
     # Only process history if this tab is selected
     if tab7:  # This checks if the tab is active
         # Initialize session state variables if they don't exist
-        if 'saved_images_list' not in st.session_state:
-            st.session_state.saved_images_list = list_saved_images()
         if 'page_number' not in st.session_state:
             st.session_state.page_number = 0
         if 'search_query' not in st.session_state:
@@ -1385,6 +1478,8 @@ with tab7:
         
         # Get pagination settings from secrets with defaults
         items_per_page = st.secrets.get("items_per_page", 5)  # Default to 3x3 grid
+        history_limit = st.secrets.get("history_limit", 15)
+        gallery = get_gallery()
         
         # Search, filter, and refresh controls
         col1, col2, col3 = st.columns([3, 2, 1])
@@ -1392,27 +1487,24 @@ with tab7:
             search_query = st.text_input("Search filenames", value=st.session_state.search_query)
         with col2:
             filter_duplicates = st.checkbox("Filter duplicates", value=st.session_state.filter_duplicates)
-            st.session_state.filter_duplicates = filter_duplicates
         with col3:
             if st.button("Refresh Gallery"):
-                st.session_state.saved_images_list = list_saved_images(filter_duplicates)
+                gallery.sync(full=True)
                 st.session_state.page_number = 0
                 st.rerun()
 
-        # Update image list if filter setting changed
+        # Start over when the filter setting changed
         if filter_duplicates != st.session_state.filter_duplicates:
-            st.session_state.saved_images_list = list_saved_images(filter_duplicates)
+            st.session_state.filter_duplicates = filter_duplicates
             st.session_state.page_number = 0
-            st.rerun()
 
-        # Filter images based on search query
-        filtered_images = [
-            img for img in st.session_state.saved_images_list 
-            if search_query.lower() in os.path.basename(img).lower()
-        ]
+        # Only folders changed since the last look are listed again
+        gallery.sync()
+        total_images = gallery.count(search_query, filter_duplicates, history_limit)
 
         # Pagination
-        total_pages = max((len(filtered_images) - 1) // items_per_page + 1, 1)
+        total_pages = max((total_images - 1) // items_per_page + 1, 1)
+        st.session_state.page_number = min(st.session_state.page_number, total_pages - 1)
         
         # Pagination controls
         col1, col2, col3 = st.columns([1, 2, 1])
@@ -1427,16 +1519,15 @@ with tab7:
                 st.session_state.page_number += 1
                 st.rerun()
 
-        # Calculate start and end indices for current page
-        start_idx = st.session_state.page_number * items_per_page
-        end_idx = min(start_idx + items_per_page, len(filtered_images))
-        
-        # Display current page images
+        # Query only the current page
         cols_per_row = 3
-        current_page_images = filtered_images[start_idx:end_idx]
+        current_page_images = gallery.page(
+            st.session_state.page_number * items_per_page, items_per_page,
+            search_query, filter_duplicates, history_limit
+        )
         
         # Show total count of filtered images
-        st.caption(f"Showing {len(current_page_images)} of {len(filtered_images)} images")
+        st.caption(f"Showing {len(current_page_images)} of {total_images} images")
 
         # Display images in grid
         for i in range(0, len(current_page_images), cols_per_row):
@@ -1445,14 +1536,16 @@ with tab7:
                 idx = i + j
                 if idx < len(current_page_images):
                     with cols[j]:
-                        image_path = current_page_images[idx]
-                        image = Image.open(image_path)
-                        st.image(image, use_container_width=True)
-
+                        item = current_page_images[idx]
+                        image_path = item.path
                         filename = os.path.basename(image_path)
-                        modified_time = datetime.fromtimestamp(
-                            os.path.getmtime(image_path)
-                        ).strftime("%Y-%m-%d %H:%M")
+                        try:
+                            # Stored thumbnail, the original is opened on "Send to Sticker tab"
+                            st.image(gallery.thumbnails.get(item), use_container_width=True)
+                        except OSError as e:
+                            st.error(f"Cannot show {filename}: {e}")
+
+                        modified_time = datetime.fromtimestamp(item.mtime).strftime("%Y-%m-%d %H:%M")
                         st.caption(f"{filename}\n{modified_time}")
 
                         if st.button(f"Send to Sticker tab", key=f"send_to_sticker_{idx}_{st.session_state.page_number}"):
@@ -1479,4 +1572,4 @@ with tab8:
         PRINT ALOT is the best!
         """
     )
-    st.image(Image.open("assets/station_sm.jpg"), caption="TAMI printshop", use_container_width=True)
+    st.image(preview_file("assets/station_sm.jpg", PREVIEW_WIDTH), caption="TAMI printshop", use_container_width=True)
@@ -0,0 +1,46 @@
+from functools import lru_cache
+import numpy as np
+import qrcode
+from PIL import Image
+
+ERROR_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+QUIET_ZONE = 2  # modules of white around the code, the label edge adds more
+
+
+def qr_matrix(data, error="M"):
+    """Boolean module matrix of a QR code, True is dark"""
+    qr = qrcode.QRCode(border=0, error_correction=ERROR_LEVELS[error])
+    qr.add_data(data)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+@lru_cache(maxsize=64)
+def _qr_image(data, error, width, quiet):
+    matrix = qr_matrix(data, error)
+    modules = len(matrix) + 2 * quiet
+    pitch = width // modules
+    if pitch < 1:
+        raise ValueError(f"QR code of {modules} modules does not fit {width} dots")
+
+    # Whole dots per module, so no module is ever resampled
+    size = modules * pitch
+    canvas = np.full((size, width), 255, dtype=np.uint8)
+    block = matrix.repeat(pitch, axis=0).repeat(pitch, axis=1)
+    x = (width - size) // 2 + quiet * pitch
+    y = quiet * pitch
+    canvas[y:y + block.shape[0], x:x + block.shape[1]][block] = 0
+    return Image.fromarray(canvas)
+
+
+def qr_image(data, error="M", width=696, quiet=QUIET_ZONE):
+    """
+    QR code width dots wide as an L image, drawn at the largest integer
+    module pitch that fits. Cached by (data, error level, width).
+    """
+    return _qr_image(data, error, width, quiet).copy()
@@ -0,0 +1,45 @@
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from font_fit import load_font
+
+TEMPLATE_PATH = "templates/template.png"
+FONT_PATH = "fonts/DelaGothicOne-Regular.ttf"
+FONT_SIZE = 35
+TEXT_CENTER = 540  # x the username is centred on
+TEXT_TOP = 685
+
+
+class StickerTemplate:
+    """
+    The OSTERLAN sticker: the template decoded and the font loaded once.
+    A sticker only draws the username into a copy of the text band and
+    pastes it over a copy of the template.
+    """
+
+    def __init__(self, path=TEMPLATE_PATH, font_path=FONT_PATH, font_size=FONT_SIZE,
+                 center=TEXT_CENTER, top=TEXT_TOP):
+        with Image.open(path) as image:
+            self.image = image.copy()  # decoded, in its own mode as before
+        try:
+            self.font = load_font(font_path, font_size)
+        except OSError:
+            self.font = ImageFont.load_default()  # Fallback to default font
+        self.center = center
+        ascent, descent = self.font.getmetrics()
+        self.region = (0, top, self.image.width, min(self.image.height, top + ascent + descent))
+        self.band = self.image.crop(self.region)
+
+    def render(self, text):
+        band = self.band.copy()
+        draw = ImageDraw.Draw(band)
+        x = self.center - draw.textlength(text, font=self.font) // 2
+        draw.text((x, 0), text, fill="black", font=self.font)
+        image = self.image.copy()
+        image.paste(band, self.region[:2])
+        return image
+
+
+@lru_cache(maxsize=4)
+def get_sticker_template(path=TEMPLATE_PATH, font_path=FONT_PATH):
+    """One decoded template per process, shared across reruns"""
+    return StickerTemplate(path, font_path)
@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+import cat_prefetch
+from cat_prefetch import CatPrefetcher
+
+FETCH_TIME = 0.3
+MIN_INTERVAL = 2.0
+
+
+@pytest.fixture
+def cats(monkeypatch):
+    """
+    (calls, start): start() makes a prefetcher on a slow fake API, calls
+    records when the API was hit. The refill loops are idled before the
+    fake is removed, so they never reach the real API.
+    """
+    calls, prefetchers = [], []
+    lock = threading.Lock()
+
+    def fetch_cat(api_key, prepare, label_width):
+        with lock:
+            calls.append(time.monotonic())
+        time.sleep(FETCH_TIME)
+        return ("gray", label_width)
+
+    def start():
+        prefetcher = CatPrefetcher("key", None, 696, size=1, min_interval=MIN_INTERVAL)
+        prefetchers.append(prefetcher)
+        return prefetcher
+
+    monkeypatch.setattr(cat_prefetch, "fetch_cat", fetch_cat)
+    yield calls, start
+    for prefetcher in prefetchers:
+        with prefetcher._cond:
+            prefetcher.size = 0
+            while prefetcher._refilling:
+                prefetcher._cond.wait()
+
+
+def first_cat(prefetcher, label_width=696):
+    return prefetcher.pop(label_width) or prefetcher.fetch_now(label_width)
+
+
+def test_first_cat_takes_the_refill_in_flight(cats):
+    calls, start = cats
+    prefetcher = start()
+
+    started = time.monotonic()
+    assert first_cat(prefetcher) == ("gray", 696)
+    assert time.monotonic() - started < FETCH_TIME + 0.5
+    assert len(calls) == 1
+
+
+def test_waiting_user_gets_the_next_slot(cats):
+    calls, start = cats
+    prefetcher = start()
+    first_cat(prefetcher)
+
+    # The ring is empty and the refill waits for the next slot, the user
+    # takes that cat and the API still sees min_interval between calls
+    time.sleep(FETCH_TIME + 0.1)
+    assert first_cat(prefetcher) == ("gray", 696)
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= MIN_INTERVAL - 0.01
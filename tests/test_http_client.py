@@ -0,0 +1,87 @@
+from http.server import BaseHTTPRequestHandler
+import pytest
+import http_client
+from http_client import ResponseCache, cache_key, cached_get
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """JSON endpoint with an ETag, records every request it gets"""
+    requests = []
+    cache_control = "max-age=60"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        type(self).requests.append((self.path, dict(self.headers)))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Cache-Control", self.cache_control)
+            self.end_headers()
+            return
+        body = b'{"accept": "%s"}' % self.headers.get("Accept", "").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"v1"')
+        self.send_header("Cache-Control", self.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(http_client, "response_cache", cache)
+    return cache
+
+
+def handler(cache_control):
+    return type("Handler", (CountingHandler,), {"requests": [], "cache_control": cache_control})
+
+
+def test_200_is_cached_and_served_within_ttl(serve, cache):
+    Handler = handler("max-age=60")
+    url = serve(Handler) + "/breeds"
+
+    first = cached_get(url)
+    second = cached_get(url)
+
+    assert first.json() == {"accept": "*/*"}  # the session default
+    assert second is first
+    assert len(Handler.requests) == 1
+    assert cache.get(url) is first
+
+
+def test_stale_entry_is_revalidated_with_etag(serve, cache):
+    Handler = handler("no-cache")
+    url = serve(Handler) + "/breeds"
+
+    first = cached_get(url)
+    second = cached_get(url)
+
+    assert len(Handler.requests) == 2
+    assert Handler.requests[1][1].get("If-None-Match") == '"v1"'
+    assert second.body == first.body
+
+
+def test_request_headers_are_part_of_the_key(serve, cache):
+    Handler = handler("max-age=60")
+    url = serve(Handler) + "/breeds"
+
+    json_response = cached_get(url, headers={"Accept": "application/json"})
+    text_response = cached_get(url, headers={"Accept": "text/plain"})
+    again = cached_get(url, headers={"accept": "application/json"})
+
+    assert json_response.json() == {"accept": "application/json"}
+    assert text_response.json() == {"accept": "text/plain"}
+    assert again is json_response
+    assert len(Handler.requests) == 2
+
+
+def test_cache_key_hides_header_values():
+    key = cache_key("https://example.org/", {"x-api-key": "secret"})
+    assert key.startswith("https://example.org/ ")
+    assert "secret" not in key
+    assert cache_key("https://example.org/") == "https://example.org/"
@@ -0,0 +1,89 @@
+import io
+import time
+from http.server import BaseHTTPRequestHandler
+import pytest
+from PIL import Image
+import http_client
+import image_fetch
+from http_client import ResponseCache
+
+
+def png_bytes(size):
+    buffer = io.BytesIO()
+    Image.new("L", size, 255).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def handler(body, content_type="image/png", delay=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.end_headers()
+            if not delay:
+                self.wfile.write(body)
+                return
+            # Trickle the body a few bytes at a time
+            for start in range(0, len(body), 16):
+                self.wfile.write(body[start:start + 16])
+                self.wfile.flush()
+                time.sleep(delay)
+    return Handler
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    cache = ResponseCache()
+    monkeypatch.setattr(http_client, "response_cache", cache)
+    monkeypatch.setattr(image_fetch, "response_cache", cache)
+    return cache
+
+
+def fetch(url, **limits):
+    """_fetch skips the HTTPS check that the stub server cannot pass"""
+    params = {"timeout": 5, "max_bytes": image_fetch.MAX_DOWNLOAD_BYTES,
+              "max_pixels": image_fetch.MAX_IMAGE_PIXELS, "deadline": 10}
+    params.update(limits)
+    deadline_at = time.monotonic() + params.pop("deadline")
+    return image_fetch._fetch(url, params["timeout"], params["max_bytes"], params["max_pixels"], deadline_at)
+
+
+def test_fetches_and_caches_an_image(serve, cache):
+    url = serve(handler(png_bytes((40, 30)))) + "/cat.png"
+    image, error = fetch(url)
+    assert error is None
+    assert image.size == (40, 30)
+    assert cache.get(url) is not None
+
+
+def test_rejects_non_images(serve):
+    url = serve(handler(b"<html></html>", content_type="text/html")) + "/"
+    assert fetch(url) == (None, "URL does not point to a valid image")
+
+
+def test_rejects_oversized_downloads(serve):
+    url = serve(handler(png_bytes((400, 400)) + b"\0" * 4096)) + "/big.png"
+    image, error = fetch(url, max_bytes=1024)
+    assert image is None
+    assert error.startswith("Image is too large")
+
+
+def test_rejects_too_many_pixels(serve):
+    url = serve(handler(png_bytes((3000, 3000)))) + "/bomb.png"
+    image, error = fetch(url, max_pixels=1_000_000)
+    assert image is None
+    assert error == "Image dimensions 3000x3000 are too large"
+
+
+def test_slow_server_hits_the_deadline(serve):
+    url = serve(handler(png_bytes((200, 200)), delay=0.2)) + "/slow.png"
+    started = time.monotonic()
+    assert fetch(url, deadline=1) == (None, "Image download took too long")
+    assert time.monotonic() - started < 2
+
+
+def test_only_https_is_fetched():
+    assert image_fetch.fetch_image("http://example.org/cat.png") == (None, "Only HTTPS URLs are allowed for security")
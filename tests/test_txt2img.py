@@ -0,0 +1,117 @@
+from http.server import BaseHTTPRequestHandler
+import pytest
+from txt2img import StubHandler, Txt2ImgClient, queue_when_done
+
+
+def counting_stub(delay=0.3):
+    """The bundled stub, counting the generations it serves"""
+    class Handler(StubHandler):
+        calls = []
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            type(self).calls.append(self.path)
+            super().do_POST()
+
+    Handler.delay = delay
+    return Handler
+
+
+class FailingHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.send_error(500)
+
+
+class FakeQueue:
+    def __init__(self):
+        self.jobs = []
+
+    def add_job(self, image, **params):
+        self.jobs.append((image, params))
+        return f"job-{len(self.jobs)}"
+
+
+@pytest.fixture
+def client_for(tmp_path):
+    clients = []
+
+    def make(url):
+        client = Txt2ImgClient(url, cache_dir=str(tmp_path / "cache"))
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.pool.shutdown(wait=True)
+
+
+def test_fixed_seed_requests_in_flight_share_one_generation(serve, client_for):
+    Handler = counting_stub()
+    client = client_for(serve(Handler))
+
+    first = client.generate("a cat", 10, 42)
+    second = client.generate("a cat", 10, 42)
+
+    assert second is first
+    assert first.result(timeout=10).size == (512, 512)
+    assert len(Handler.calls) == 1
+
+
+def test_random_seed_requests_are_not_shared(serve, client_for):
+    Handler = counting_stub()
+    client = client_for(serve(Handler))
+
+    first = client.generate("a cat", 10)
+    second = client.generate("a cat", 10)
+
+    assert second is not first
+    first.result(timeout=10), second.result(timeout=10)
+    assert len(Handler.calls) == 2
+
+
+def test_fixed_seed_results_come_from_the_disk_cache(serve, client_for, tmp_path):
+    Handler = counting_stub(delay=0)
+    url = serve(Handler)
+
+    generated = client_for(url).generate("a cat", 10, 42).result(timeout=10)
+    # A new client, as after a restart, reads the stored PNG
+    cached = client_for(url).generate("a cat", 10, 42).result(timeout=10)
+
+    assert len(Handler.calls) == 1
+    assert cached.tobytes() == generated.tobytes()
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+
+def test_random_seed_results_are_not_cached(serve, client_for, tmp_path):
+    client = client_for(serve(counting_stub(delay=0)))
+    client.generate("a cat", 10).result(timeout=10)
+    assert not (tmp_path / "cache").exists()
+
+
+def test_queue_when_done_adds_the_prepared_image(serve, client_for):
+    client = client_for(serve(counting_stub(delay=0)))
+    queue = FakeQueue()
+
+    job = queue_when_done(client.generate("a cat", 10, 1), queue, lambda image: image.convert("1"), dither=True)
+
+    assert job.result(timeout=10) == "job-1"
+    (image, params), = queue.jobs
+    assert image is None
+    assert params["dither"] is True
+    assert params["pages"][0].mode == "1"
+
+
+def test_queue_when_done_reports_failed_generations(serve, client_for):
+    client = client_for(serve(FailingHandler))
+    queue = FakeQueue()
+
+    job = queue_when_done(client.generate("a cat", 10, 1), queue, lambda image: image)
+
+    with pytest.raises(Exception):
+        job.result(timeout=10)
+    assert queue.jobs == []
@@ -0,0 +1,186 @@
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from font_fit import load_font, MIN_SIZE
+from bitmap_font import snap_size
+
+LAYOUT_MAX_SIZE = 600  # rotated labels can use far more than the width fit allows
+GREEDY = "greedy"
+OPTIMAL = "optimal"
+
+
+class GlyphMetrics:
+    """Advance widths of one font, each character measured once"""
+
+    def __init__(self, font):
+        self.font = font
+        self.advances = {}
+
+    def advance(self, char):
+        width = self.advances.get(char)
+        if width is None:
+            width = self.advances[char] = self.font.getlength(char)
+        return width
+
+    def width(self, text):
+        return sum(self.advance(char) for char in text)
+
+
+@lru_cache(maxsize=128)
+def glyph_metrics(path, size):
+    return GlyphMetrics(load_font(path, size))
+
+
+def _split_long_word(word, metrics, width):
+    """Break a word wider than the label into pieces that fit"""
+    pieces, piece, piece_width = [], "", 0
+    for char in word:
+        advance = metrics.advance(char)
+        if piece and piece_width + advance > width:
+            pieces.append(piece)
+            piece, piece_width = "", 0
+        piece += char
+        piece_width += advance
+    pieces.append(piece)
+    return pieces
+
+
+def _words(paragraph, metrics, width):
+    words = []
+    for word in paragraph.split():
+        if metrics.width(word) > width:
+            words.extend(_split_long_word(word, metrics, width))
+        else:
+            words.append(word)
+    return words
+
+
+def wrap_greedy(widths, space, width):
+    """Fill each line as far as it goes; returns the index each line starts at"""
+    breaks, line_width = [0], 0
+    for i, word_width in enumerate(widths):
+        if i > breaks[-1] and line_width + space + word_width > width:
+            breaks.append(i)
+            line_width = word_width
+        else:
+            line_width += (space if i > breaks[-1] else 0) + word_width
+    return breaks
+
+
+def wrap_optimal(widths, space, width):
+    """
+    Minimum raggedness line breaking (Knuth-Plass without hyphenation):
+    dynamic programming over break points minimizing the squared slack of
+    every line but the last.
+    """
+    count = len(widths)
+    cost = [0.0] + [float("inf")] * count
+    start = [0] * (count + 1)
+    for end in range(1, count + 1):
+        line_width = -space
+        for first in range(end - 1, -1, -1):
+            line_width += widths[first] + space
+            if line_width > width and first < end - 1:
+                break
+            slack = 0 if end == count else (width - line_width) ** 2
+            if cost[first] + slack < cost[end]:
+                cost[end] = cost[first] + slack
+                start[end] = first
+    breaks, end = [], count
+    while end > 0:
+        breaks.append(start[end])
+        end = start[end]
+    return breaks[::-1]
+
+
+@lru_cache(maxsize=512)
+def layout_paragraph(paragraph, path, size, width, mode=OPTIMAL):
+    """
+    Lines of one paragraph wrapped to width dots. Cached per paragraph, so
+    while typing only the paragraph being edited is laid out again.
+    """
+    metrics = glyph_metrics(path, size)
+    words = _words(paragraph, metrics, width)
+    if not words:
+        return ("",)
+    widths = [metrics.width(word) for word in words]
+    wrap = wrap_optimal if mode == OPTIMAL else wrap_greedy
+    breaks = wrap(widths, metrics.advance(" "), width) + [len(words)]
+    return tuple(" ".join(words[a:b]) for a, b in zip(breaks, breaks[1:]))
+
+
+def layout_text(text, path, size, width, mode=OPTIMAL):
+    """Wrap every paragraph of text, explicit newlines are kept"""
+    lines = []
+    for paragraph in text.split("\n"):
+        lines.extend(layout_paragraph(paragraph, path, size, width, mode))
+    return lines
+
+
+@dataclass(frozen=True)
+class LabelLayout:
+    rotate: int  # 0 prints across the tape, 90 along it
+    size: int
+    lines: tuple
+    width: int  # dots the text block needs across its lines
+    wrapped: bool
+
+
+def block_height(path, size, line_count, line_spacing=20, padding=20):
+    """Height of a text block as the Label tab draws it"""
+    ascent, descent = load_font(path, size).getmetrics()
+    return line_count * (ascent + descent + line_spacing) + padding * 2
+
+
+def _fit(text, path, across, along, wrap_mode, line_spacing, padding):
+    """
+    Largest (size, lines, width) whose lines fit `across` dots and whose
+    block fits `along` dots, or None. Binary search, the text only gets
+    wider and taller as the size grows. Wrapping that has to split a word
+    does not count as a fit.
+    """
+    word_count = len(text.split())
+
+    def attempt(size):
+        if wrap_mode:
+            lines = tuple(layout_text(text, path, size, across, wrap_mode))
+            if sum(len(line.split()) for line in lines) != word_count:
+                return None
+        else:
+            lines = tuple(text.split("\n"))
+        metrics = glyph_metrics(path, size)
+        widest = max(lines, key=metrics.width, default="")
+        # Advances ignore the overhang of the last glyph, the drawn box does not
+        width = max(metrics.width(widest), metrics.font.getbbox(widest)[2] if widest.strip() else 0)
+        if width > across or block_height(path, size, len(lines), line_spacing, padding) > along:
+            return None
+        return size, lines, int(math.ceil(width))
+
+    lo, hi, best = MIN_SIZE, LAYOUT_MAX_SIZE, None
+    while lo <= hi:
+        middle = (lo + hi) // 2
+        result = attempt(middle)
+        if result:
+            best, lo = result, middle + 1
+        else:
+            hi = middle - 1
+    if best and snap_size(path, best[0]) != best[0]:
+        # Pixel fonts only render at whole dots per font pixel
+        best = attempt(snap_size(path, best[0]))
+    return best
+
+
+def best_layout(text, path, label_width, max_length, line_spacing=20, padding=20, wrap_mode=OPTIMAL):
+    """
+    Try the text across and along the tape, with the typed line breaks and
+    wrapped, and return the LabelLayout with the largest font that stays
+    within max_length dots of tape. None if nothing fits.
+    """
+    best = None
+    # Along the tape the text also needs its padding at both ends
+    for rotate, across, along in ((0, label_width, max_length), (90, max_length - 2 * padding, label_width)):
+        for wrapped in (False, True):
+            fit = _fit(text.rstrip("\n"), path, across, along, wrap_mode if wrapped else None, line_spacing, padding)
+            if fit and (best is None or fit[0] > best.size):
+                best = LabelLayout(rotate, fit[0], fit[1], fit[2], wrapped)
+    return best
@@ -0,0 +1,232 @@
+"""
+Stable Diffusion client for the AUTOMATIC1111 txt2img API.
+
+    python txt2img.py stub --port 8670
+    python txt2img.py generate "a cat in a spacesuit" --url http://localhost:8670 --seed 42
+
+The stub answers /sdapi/v1/txt2img with a drawn placeholder, so the app
+and the client can be run without a GPU.
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image, ImageDraw
+from http_client import session
+
+TXT2IMG_PATH = "/sdapi/v1/txt2img"
+CACHE_DIR = os.path.join("temp", "txt2img")  # below temp/, not listed in the history
+DEFAULT_STEPS = 30
+RANDOM_SEED = -1  # the API picks a seed, such results are not cached
+IMAGE_SIZE = 512
+TIMEOUT = 300  # seconds, a busy GPU queues requests
+WORKERS = 2
+
+
+def cache_key(prompt, steps, seed):
+    return hashlib.sha1(json.dumps([prompt, steps, seed]).encode()).hexdigest()
+
+
+def _open_png(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+
+class Txt2ImgClient:
+    """
+    Runs generations on a small thread pool so the script thread never
+    waits for the GPU. Identical fixed-seed requests in flight share one
+    Future and their results are kept on disk.
+    """
+
+    def __init__(self, base_url, cache_dir=CACHE_DIR, workers=WORKERS, timeout=TIMEOUT, size=IMAGE_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.size = size
+        self.pending = {}  # (prompt, steps, seed) -> Future
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="txt2img")
+
+    def cache_path(self, prompt, steps, seed):
+        return os.path.join(self.cache_dir, cache_key(prompt, steps, seed) + ".png")
+
+    def cached(self, prompt, steps, seed):
+        """The stored result for a fixed seed, or None"""
+        if seed == RANDOM_SEED:
+            return None
+        try:
+            with open(self.cache_path(prompt, steps, seed), "rb") as f:
+                return _open_png(f.read())
+        except OSError:
+            return None
+
+    def generate(self, prompt, steps=DEFAULT_STEPS, seed=RANDOM_SEED):
+        """
+        Future of the generated PIL image, raises from result() on failure.
+        Only fixed seeds are shared, a random seed asks for a new picture.
+        """
+        if seed == RANDOM_SEED:
+            return self.pool.submit(self._generate, prompt, steps, seed)
+
+        key = (prompt, steps, seed)
+        with self.lock:
+            future = self.pending.get(key)
+            if future is None:
+                future = self.pool.submit(self._generate, prompt, steps, seed)
+                self.pending[key] = future
+            else:
+                print(f"txt2img: joining in-flight request for {prompt!r}")
+                return future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _forget(self, key, future):
+        with self.lock:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+    def _generate(self, prompt, steps, seed):
+        image = self.cached(prompt, steps, seed)
+        if image is not None:
+            return image
+
+        started = time.monotonic()
+        response = session.post(
+            self.base_url + TXT2IMG_PATH,
+            json={"prompt": prompt, "steps": steps, "seed": seed, "width": self.size, "height": self.size},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        # Some versions prefix the base64 with a data URL header
+        data = base64.b64decode(response.json()["images"][0].split(",", 1)[-1])
+        image = _open_png(data)
+        print(f"txt2img: {prompt!r} took {time.monotonic() - started:.1f}s")
+
+        if seed != RANDOM_SEED:
+            # Store the PNG as received, written aside and renamed so a
+            # concurrent reader never sees half a file
+            path = self.cache_path(prompt, steps, seed)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            partial = f"{path}.{threading.get_ident()}.part"
+            with open(partial, "wb") as f:
+                f.write(data)
+            os.replace(partial, path)
+        return image
+
+
+@lru_cache(maxsize=4)
+def get_client(base_url):
+    """One client per API URL, shared by all sessions"""
+    return Txt2ImgClient(base_url)
+
+
+def queue_when_done(future, print_queue, prepare, **params):
+    """
+    Future of a print job id. When the image arrives, prepare(image) is
+    added to print_queue from the client thread, so the job is queued even
+    if nobody reruns the page. params are the usual add_job parameters.
+    """
+    job = Future()
+
+    def add_job(generation):
+        try:
+            page = prepare(generation.result())
+            job.set_result(print_queue.add_job(None, pages=[page], **params))
+        except Exception as e:
+            print(f"txt2img: not printing, {e}")
+            job.set_exception(e)
+
+    future.add_done_callback(add_job)
+    return job
+
+
+def stub_image(prompt, steps, seed, size=IMAGE_SIZE):
+    """Deterministic placeholder: noise from the seed with the prompt on top"""
+    rng = random.Random(f"{prompt}|{steps}|{seed}")
+    image = Image.new("L", (size, size), 255)
+    draw = ImageDraw.Draw(image)
+    for _ in range(steps * 4):
+        x, y, r = rng.randrange(size), rng.randrange(size), rng.randrange(4, size // 8)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=rng.randrange(256))
+    draw.rectangle((0, size - 40, size, size), fill=255)
+    draw.text((10, size - 30), prompt[:60], fill=0)
+    return image
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.0  # seconds per request, to watch the app wait
+
+    def do_POST(self):
+        if self.path != TXT2IMG_PATH:
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        seed = request.get("seed", RANDOM_SEED)
+        if seed == RANDOM_SEED:
+            seed = random.randrange(2 ** 32)
+        time.sleep(self.delay)
+
+        buffer = io.BytesIO()
+        stub_image(request.get("prompt", ""), request.get("steps", DEFAULT_STEPS), seed,
+                   request.get("width", IMAGE_SIZE)).save(buffer, "PNG")
+        body = json.dumps({
+            "images": [base64.b64encode(buffer.getvalue()).decode()],
+            "info": json.dumps({"seed": seed}),
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_stub(port=8670, delay=0.0):
+    """Start the stub on a background thread, returns the server"""
+    handler = type("Handler", (StubHandler,), {"delay": delay})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stable Diffusion txt2img client and stub server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stub = commands.add_parser("stub", help="serve placeholder images on the txt2img API")
+    stub.add_argument("--port", type=int, default=8670)
+    stub.add_argument("--delay", type=float, default=2.0, help="seconds per generation")
+
+    generate = commands.add_parser("generate", help="generate one image and save it")
+    generate.add_argument("prompt")
+    generate.add_argument("--url", default="http://localhost:8670")
+    generate.add_argument("--steps", type=int, default=DEFAULT_STEPS)
+    generate.add_argument("--seed", type=int, default=RANDOM_SEED)
+    generate.add_argument("-o", "--output", default="txt2img.png")
+
+    args = parser.parse_args()
+    if args.command == "stub":
+        server = serve_stub(args.port, args.delay)
+        print(f"Stub txt2img API on http://127.0.0.1:{args.port}{TXT2IMG_PATH}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    image = get_client(args.url).generate(args.prompt, args.steps, args.seed).result()
+    image.save(args.output)
+    print(f"Saved {image.size[0]}x{image.size[1]} image to {args.output}")
+
+
+if __name__ == "__main__":
+    main()